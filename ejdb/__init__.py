@@ -12,6 +12,10 @@ from .api import (      # noqa
     CollectionDoesNotExist, DatabaseError, TransactionError, OperationError,
     READ, WRITE, CREATE, TRUNCATE, NOLOCK, NOBLOCK, SYNC,
     STRING, ISTRING, NUMBER, ARRAY,
+    DURABILITY_NONE, DURABILITY_INTERVAL, DURABILITY_EVERY_TRANSACTION,
+    IMPORT_UPDATE, IMPORT_REPLACE,
+    MAINTENANCE_OPTIMIZE, MAINTENANCE_REBUILD,
     get_ejdb_version, is_valid_oid, Collection, Database,
 )
+from .bson import ObjectId    # noqa
 from .c import init     # noqa
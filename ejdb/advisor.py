@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Index advisor.
+
+An :class:`Advisor` records the shape of every query executed on a database,
+i.e. the fields it filters and sorts on, with how often it runs and how long
+it takes. Shapes are then checked against the indexes of each collection to
+recommend indexes for frequent queries that scan the whole collection::
+
+    advisor = Advisor(database)
+    with advisor:
+        ...     # Run the application.
+    for recommendation in advisor.recommend():
+        print(recommendation)
+    advisor.apply()     # Optionally create the recommended indexes.
+"""
+
+from __future__ import absolute_import, division, unicode_literals
+import collections
+import datetime
+import threading
+
+import six
+
+from . import c
+from .api import ARRAY, ISTRING, NUMBER, STRING, CollectionDoesNotExist
+from .utils import coerce_str
+
+
+QueryStats = collections.namedtuple('QueryStats', [
+    'collection', 'predicates', 'sort_keys',
+    'count', 'seconds', 'results', 'explained', 'full_scans',
+])
+"""Statistics of a query shape, from :func:`Advisor.queries`.
+
+:param collection: Name of the collection queried.
+:param predicates: A tuple of (path, index type) of fields filtered on.
+:param sort_keys: A tuple of paths sorted on.
+:param count: Number of times the query was executed.
+:param seconds: Total seconds spent executing the query.
+:param results: Total number of documents matched.
+:param explained: Number of executions with an execution log.
+:param full_scans: Number of explained executions that scanned the whole
+    collection, or sorted results in memory.
+"""
+
+Recommendation = collections.namedtuple('Recommendation', [
+    'collection', 'path', 'type', 'queries', 'seconds', 'benefit', 'reason',
+])
+"""An index recommended by :func:`Advisor.recommend`.
+
+:param collection: Name of the collection.
+:param path: Field path to index.
+:param type: Index type, e.g. :data:`ejdb.STRING`.
+:param queries: Number of executions that could use the index.
+:param seconds: Total seconds spent in these executions.
+:param benefit: Estimated seconds these executions would have saved.
+:param reason: ``'filter'`` if the path is filtered on, ``'sort'`` if it is
+    only sorted on.
+"""
+
+# Operators whose operands can be looked up in an index, and the kind of
+# index they need. `None` means the kind of the operand's values.
+_INDEXED_OPERATORS = {
+    '$gt': None, '$gte': None, '$lt': None, '$lte': None, '$bt': None,
+    '$in': None, '$begin': STRING, '$icase': ISTRING,
+    '$strand': ARRAY, '$stror': ARRAY,
+}
+
+# Phrases in execution logs of `ejdbqryexecute`.
+_FULL_SCAN_PHRASES = ('RUN FULLSCAN', 'FINAL SORTING: YES')
+
+
+def _get_value_type(value):
+    """Get the index type to look up `value` with, `None` if not indexable.
+    """
+    if isinstance(value, (list, tuple)):
+        return _get_value_type(value[0]) if value else None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, six.string_types):
+        return STRING
+    if isinstance(value, six.integer_types + (
+            float, datetime.date, datetime.datetime)):
+        return NUMBER
+    return None
+
+
+def _get_operator_type(operator, operand):
+    try:
+        index_type = _INDEXED_OPERATORS[operator]
+    except KeyError:
+        return None
+    if index_type is None:
+        index_type = _get_value_type(operand)
+    return index_type
+
+
+def _is_operators(value):
+    return (
+        isinstance(value, collections.Mapping) and bool(value) and
+        all(coerce_str(k).startswith('$') for k in value)
+    )
+
+
+def get_predicates(query):
+    """Get (path, index type) of fields `query` filters on, that can be
+    looked up in an index.
+
+    Update operators, and conditions that cannot use an index (e.g.
+    ``$ne``, ``$exists``) are ignored.
+    """
+    predicates = set()
+    pending = [query]
+    while pending:
+        query = pending.pop()
+        for key, value in query.items():
+            key = coerce_str(key)
+            if key in ('$and', '$or'):
+                pending.extend(v for v in value
+                               if isinstance(v, collections.Mapping))
+                continue
+            if key.startswith('$') or key == c.JDBIDKEYNAME:
+                continue    # Update operator, or the primary key.
+            if _is_operators(value):
+                types = [
+                    _get_operator_type(coerce_str(op), operand)
+                    for op, operand in value.items()
+                ]
+            else:
+                types = [_get_value_type(value)]
+            predicates.update((key, t) for t in types if t is not None)
+    return tuple(sorted(predicates, key=lambda p: (p[0], p[1].flags)))
+
+
+def get_sort_keys(hints):
+    """Get paths sorted on by ``$orderby`` in `hints`.
+    """
+    orderby = hints.get('$orderby') or {}
+    return tuple(coerce_str(k) for k in orderby)
+
+
+def _get_path(document, path):
+    for key in path.split('.'):
+        if not isinstance(document, collections.Mapping):
+            return None
+        document = document.get(key)
+    return document
+
+
+class _ShapeStats(object):
+
+    __slots__ = (
+        'count', 'seconds', 'results', 'explained', 'full_scans',
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.results = 0
+        self.explained = 0
+        self.full_scans = 0
+
+
+class Advisor(object):
+    """Record queries executed on `database`, and recommend indexes.
+
+    Recording starts with :func:`start` and stops with :func:`stop`. An
+    advisor can also be used as a context manager to record queries in a
+    block. Only one advisor can record a database at a time.
+
+    :param explain: Ask EJDB for an execution log of each query, to tell
+        whether an index is actually used. Otherwise this is guessed from
+        the indexes present. Logging makes queries slightly slower.
+    :param max_shapes: Maximum number of distinct query shapes to keep.
+        Queries of new shapes are not recorded beyond this.
+    """
+    def __init__(self, database, explain=False, max_shapes=1024):
+        super(Advisor, self).__init__()
+        self.database = database
+        self.explain = explain
+        self.max_shapes = max_shapes
+        self._shapes = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Start recording queries executed on the database.
+        """
+        recorder = self.database._query_recorder
+        if recorder is not None and recorder is not self:
+            raise ValueError('Another advisor is recording this database.')
+        self.database._query_recorder = self
+
+    def stop(self):
+        """Stop recording queries. Recorded statistics are kept.
+        """
+        if self.database._query_recorder is self:
+            self.database._query_recorder = None
+
+    def clear(self):
+        """Forget all recorded statistics.
+        """
+        with self._lock:
+            self._shapes.clear()
+
+    def record(self, collection, queries, hints, flags, count, seconds,
+               log=None):
+        """Record an execution of a query. Called by :class:`ejdb.Collection`.
+
+        :param log: Execution log of the query, if :attr:`explain` is set.
+        """
+        if getattr(self._local, 'paused', False):
+            return
+        predicates = set()
+        for query in queries:
+            predicates.update(get_predicates(query))
+        key = (
+            collection.name,
+            tuple(sorted(predicates, key=lambda p: (p[0], p[1].flags))),
+            get_sort_keys(hints),
+        )
+        with self._lock:
+            try:
+                stats = self._shapes[key]
+            except KeyError:
+                if len(self._shapes) >= self.max_shapes:
+                    return
+                stats = self._shapes[key] = _ShapeStats()
+            stats.count += 1
+            stats.seconds += seconds
+            stats.results += count
+            if log is not None:
+                stats.explained += 1
+                if any(phrase in log for phrase in _FULL_SCAN_PHRASES):
+                    stats.full_scans += 1
+
+    def queries(self):
+        """List statistics of recorded query shapes.
+
+        :returns: A list of :class:`QueryStats`, most time-consuming first.
+        """
+        with self._lock:
+            items = [
+                QueryStats(
+                    collection=name, predicates=predicates,
+                    sort_keys=sort_keys, count=s.count, seconds=s.seconds,
+                    results=s.results, explained=s.explained,
+                    full_scans=s.full_scans,
+                )
+                for (name, predicates, sort_keys), s in self._shapes.items()
+            ]
+        items.sort(key=lambda q: q.seconds, reverse=True)
+        return items
+
+    def _guess_sort_type(self, collection, path, predicates):
+        for predicate_path, index_type in predicates:
+            if predicate_path == path:
+                return index_type
+        # Look at a document. Don't record the lookup itself.
+        self._local.paused = True
+        try:
+            document = collection.find_one(
+                {path: {'$exists': True}}, hints={'$fields': {path: 1}},
+            )
+        finally:
+            self._local.paused = False
+        if document is None:
+            return None
+        return _get_value_type(_get_path(document, path))
+
+    def recommend(self, min_queries=10):
+        """Recommend indexes for recorded queries.
+
+        A query shape is considered unindexed if its execution logs report a
+        full scan or an in-memory sort, or, without logs, if none of the
+        fields it filters on has an index of the needed type. Each field of
+        an unindexed shape is then a candidate for an index. The benefit of
+        an index is estimated as the time spent in these queries, scaled by
+        the fraction of documents they did not match, i.e. the work a full
+        scan wastes.
+
+        :param min_queries: Minimum number of executions that could use an
+            index for it to be recommended.
+        :returns: A list of :class:`Recommendation`, most beneficial first.
+        """
+        catalogs = {}
+        candidates = collections.OrderedDict()
+        for query in self.queries():
+            if query.collection not in catalogs:
+                try:
+                    collection = self.database[query.collection]
+                except CollectionDoesNotExist:
+                    catalogs[query.collection] = None
+                else:
+                    stats = collection.stats()
+                    catalogs[query.collection] = (
+                        collection, stats.records,
+                        set((i.path, i.type) for i in stats.indexes),
+                    )
+            catalog = catalogs[query.collection]
+            if catalog is None:
+                continue
+            collection, records, indexes = catalog
+
+            if query.explained:
+                if not query.full_scans:
+                    continue
+                unindexed = set(query.predicates) - indexes
+            else:
+                if any(p in indexes for p in query.predicates):
+                    continue
+                unindexed = set(query.predicates)
+            wanted = [(path, t, 'filter') for path, t in unindexed]
+            filtered_paths = set(path for path, _ in unindexed)
+            for path in query.sort_keys:
+                if path in filtered_paths:
+                    continue
+                index_type = self._guess_sort_type(
+                    collection, path, query.predicates,
+                )
+                if index_type is not None and (path, index_type) not in (
+                        indexes):
+                    wanted.append((path, index_type, 'sort'))
+            if not wanted:
+                continue
+
+            scanned = query.count * records
+            selectivity = min(query.results / scanned, 1.0) if scanned else 1.0
+            benefit = query.seconds * (1.0 - selectivity)
+            for path, index_type, reason in wanted:
+                key = (query.collection, path, index_type)
+                count, seconds, total_benefit, reasons = candidates.get(
+                    key, (0, 0.0, 0.0, set()),
+                )
+                reasons.add(reason)
+                candidates[key] = (
+                    count + query.count, seconds + query.seconds,
+                    total_benefit + benefit, reasons,
+                )
+
+        recommendations = [
+            Recommendation(
+                collection=name, path=path, type=index_type, queries=count,
+                seconds=seconds, benefit=benefit,
+                reason='filter' if 'filter' in reasons else 'sort',
+            )
+            for (name, path, index_type), (count, seconds, benefit, reasons)
+            in candidates.items()
+            if count >= min_queries
+        ]
+        recommendations.sort(key=lambda r: r.benefit, reverse=True)
+        return recommendations
+
+    def apply(self, recommendations=None, min_queries=10):
+        """Create recommended indexes.
+
+        :param recommendations: A list of :class:`Recommendation` to apply.
+            Defaults to the result of :func:`recommend` with `min_queries`.
+        :returns: The list of recommendations applied.
+        """
+        if recommendations is None:
+            recommendations = self.recommend(min_queries=min_queries)
+        for recommendation in recommendations:
+            collection = self.database[recommendation.collection]
+            collection.create_index(recommendation.path, recommendation.type)
+        return recommendations
@@ -4,12 +4,20 @@
 from __future__ import absolute_import, unicode_literals
 import collections
 import ctypes
+import datetime
 import functools
+import json
+import os
+import threading
+import time
+import warnings
+import weakref
 
 import six
 
-from . import bson, c, tc
-from .utils import CObjectWrapper, coerce_char_p, coerce_str
+from . import bson, c, extjson, tc
+from .cache import LRUCache
+from .utils import CObjectWrapper, PeriodicTimer, coerce_char_p, coerce_str
 
 
 class DatabaseError(Exception):
@@ -68,6 +76,96 @@ NUMBER = Index(c.JBIDXNUM, 'number')
 ARRAY = Index(c.JBIDXARR, 'array')
 """An array index type."""
 
+IMPORT_UPDATE = 'update'
+"""Update existing documents in collections with imported ones."""
+
+IMPORT_REPLACE = 'replace'
+"""Recreate existing collections, replacing their documents."""
+
+_IMPORT_MODES = {
+    IMPORT_UPDATE: c.JBIMPORTUPDATE,
+    IMPORT_REPLACE: c.JBIMPORTREPLACE,
+}
+
+_EXPORT_FORMATS = {'bson': 0, 'json': c.JBJSONEXPORT}
+
+DumpReport = collections.namedtuple('DumpReport', [
+    'collections', 'seconds', 'log',
+])
+"""Result of :func:`Database.export` and :func:`Database.import_`.
+
+:param collections: An ordered mapping of collection names to seconds spent
+    on each collection.
+:param seconds: Total seconds spent.
+:param log: Log messages from EJDB.
+"""
+
+# Index types by the first character of index names in database metadata.
+_INDEX_TYPES_BY_PREFIX = {'s': STRING, 'i': ISTRING, 'n': NUMBER, 'a': ARRAY}
+
+IndexInfo = collections.namedtuple('IndexInfo', [
+    'path', 'type', 'name', 'records', 'file', 'size',
+])
+"""An index of a collection, from :func:`Collection.indexes`.
+
+:param path: Field path the index is on.
+:param type: Index type, e.g. :data:`STRING`.
+:param name: Name of the index in EJDB.
+:param records: Count of records in the index, `None` if unknown.
+:param file: Path of the index file, `None` if unknown.
+:param size: Size of the index file in bytes, `None` if unknown.
+"""
+
+CollectionStats = collections.namedtuple('CollectionStats', [
+    'name', 'records', 'file', 'size', 'options', 'indexes',
+])
+"""Statistics of a collection, from :func:`Collection.stats`.
+
+:param name: Name of the collection.
+:param records: Count of documents in the collection.
+:param file: Path of the collection file.
+:param size: Size of the collection file in bytes, `None` if unknown.
+:param options: A mapping of collection options, e.g. ``large`` and
+    ``compressed``.
+:param indexes: A list of :class:`IndexInfo` of indexes in the collection.
+"""
+
+DatabaseStats = collections.namedtuple('DatabaseStats', [
+    'file', 'size', 'collections',
+])
+"""Statistics of a database, from :func:`Database.stats`.
+
+:param file: Path of the database file.
+:param size: Total size of the database, collection and index files in bytes.
+    Files with unknown sizes are not counted.
+:param collections: An ordered mapping of collection names to
+    :class:`CollectionStats`.
+"""
+
+DURABILITY_NONE = 'none'
+"""Never synchronize explicitly. Leave flushing to the operating system."""
+
+DURABILITY_INTERVAL = 'interval'
+"""Synchronize the database periodically in a background thread."""
+
+DURABILITY_EVERY_TRANSACTION = 'every-transaction'
+"""Synchronize every transaction. Equivalent to opening with :data:`SYNC`."""
+
+_DURABILITY_LEVELS = (
+    DURABILITY_NONE, DURABILITY_INTERVAL, DURABILITY_EVERY_TRANSACTION,
+)
+
+MAINTENANCE_OPTIMIZE = 'optimize'
+"""Optimize index files, with ``JBIDXOP``."""
+
+MAINTENANCE_REBUILD = 'rebuild'
+"""Rebuild indexes from documents, with ``JBIDXREBLD``."""
+
+_MAINTENANCE_FLAGS = {
+    MAINTENANCE_OPTIMIZE: c.JBIDXOP,
+    MAINTENANCE_REBUILD: c.JBIDXREBLD,
+}
+
 
 def _ejdb_finalizer(wrapped):
     if c.ejdb.isopen(wrapped):
@@ -75,6 +173,40 @@ def _ejdb_finalizer(wrapped):
     c.ejdb.del_(wrapped)
 
 
+def _sync_database(ref):
+    """Callback for the periodic sync timer of a :class:`Database`.
+
+    The database is held by a weak reference so the timer does not keep it
+    alive. Returns `False` to stop the timer once the database is gone.
+    """
+    db = ref()
+    if db is None:
+        return False
+    if not db.is_open():
+        return
+    try:
+        db.sync()
+    except DatabaseError as e:
+        warnings.warn('Periodic sync failed: {e}'.format(e=e), RuntimeWarning)
+
+
+def _in_windows(windows, now):
+    """Check whether time of `now` is in any of the (start, end) `windows`.
+
+    A window wraps around midnight if its end is before its start.
+    """
+    if windows is None:
+        return True
+    moment = now.time()
+    for start, end in windows:
+        if start <= end:
+            if start <= moment < end:
+                return True
+        elif moment >= start or moment < end:
+            return True
+    return False
+
+
 def _set_index(collection, verb, path, index_type, flags=0):
     path_c = coerce_char_p(path)
     flags |= index_type.flags
@@ -89,6 +221,61 @@ def _set_index(collection, verb, path, index_type, flags=0):
         )
 
 
+def _write_index_journal(path, specs):
+    """Record (path, index type) of indexes into a journal file, replacing it
+    atomically, so the indexes can be restored if the process dies.
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump([[p, t.flags] for p, t in specs], f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(temp_path, path)
+
+
+def _read_index_journal(path):
+    """Read (path, index type) of indexes from a journal file.
+
+    Returns an empty list if the journal does not exist.
+    """
+    if not os.path.exists(path):
+        return []
+    types = {t.flags: t for t in _INDEX_TYPES_BY_PREFIX.values()}
+    with open(path) as f:
+        return [(p, types[flags]) for p, flags in json.load(f)]
+
+
+def _get_file_size(path):
+    if not path:
+        return None
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def _make_collection_stats(meta):
+    """Build a :class:`CollectionStats` from collection metadata reported by
+    `ejdbmeta`.
+    """
+    indexes = []
+    for index_meta in meta.get('indexes', []):
+        index_type = _INDEX_TYPES_BY_PREFIX.get(index_meta['iname'][:1])
+        if index_type is None:  # pragma: no cover
+            continue
+        indexes.append(IndexInfo(
+            path=index_meta['field'], type=index_type,
+            name=index_meta['iname'], records=index_meta.get('records'),
+            file=index_meta.get('file'),
+            size=_get_file_size(index_meta.get('file')),
+        ))
+    return CollectionStats(
+        name=meta.get('name'), records=meta.get('records'),
+        file=meta.get('file'), size=_get_file_size(meta.get('file')),
+        options=dict(meta.get('options', {})), indexes=indexes,
+    )
+
+
 def _get_errmsg(db):
     """Get the last error message.
 
@@ -109,6 +296,39 @@ def _get_id(document):
     return document.get(c.JDBIDKEYNAME, document[bson.ID_KEY_NAME])
 
 
+# Query operators that modify matched documents in place.
+_UPDATE_OPERATORS = frozenset([
+    '$set', '$inc', '$dropall', '$addToSet', '$addToSetAll', '$pull',
+    '$pullAll', '$push', '$pushAll', '$upsert', '$unset', '$rename', '$do',
+])
+
+
+def _is_update(queries):
+    return any(
+        coerce_str(key) in _UPDATE_OPERATORS
+        for query in queries for key in query
+    )
+
+
+def _to_bsonoid(oid):
+    """Convert a hex string or :class:`bson.ObjectId` to `BSONOID`.
+    """
+    if isinstance(oid, bson.ObjectId):
+        return oid.to_bsonoid()
+    return c.BSONOID.from_string(oid)
+
+
+def _get_cacheable_oid(queries, hints):
+    """Get the OID if the query is a plain `{'_id': oid}` lookup.
+    """
+    if hints or len(queries) != 1 or len(queries[0]) != 1:
+        return None
+    oid = queries[0].get(c.JDBIDKEYNAME)
+    if not isinstance(oid, six.string_types + (bson.ObjectId,)):
+        return None
+    return six.text_type(oid).lower()
+
+
 def _init_c(func):
     """Decorator that initialize the C bindings if needed.
     """
@@ -146,6 +366,11 @@ class Cursor(tc.ListIterator):
     :func:`Collection.find`. You generally should not instantiate a cursor
     directly.
     """
+    def __init__(self, wrapped, count=None, codec=None, options=None):
+        super(Cursor, self).__init__(wrapped=wrapped, count=count)
+        self._codec = codec
+        self._options = options or {}
+
     def __eq__(self, other):
         if self is other:
             return True
@@ -163,19 +388,104 @@ class Cursor(tc.ListIterator):
         pass
 
     def instantiate(self, value_p):
-        # `value_p` from `TCLIST *` is already managed, and we don't want the
-        # BSON class to manage it, only the rest of the bson struct. The
-        # solution is to pretend the data is on the stack (i.e. immutable),
-        # and `bson_del` would do the right thing (not freeing things on the
-        # stack). Since this is not really a stack value, we don't care about
-        # `mincapacity` (the third argument), so we pass 0. `maxonstack` (the
-        # fourth argument) is the bson data's length.
-        wrapped = c.bson.create()
-        c.bson.init_on_stack(wrapped, value_p, 0, c.bson.size2(value_p))
-        bs = bson.BSON(wrapped)
-        obj = bs.decode()
+        # `value_p` from `TCLIST *` is already managed by this cursor.
+        obj = bson.decode_data(
+            value_p, owner=self, codec=self._codec, **self._options
+        )
         return obj
 
+    def _get_data(self, index):
+        """Copy out the raw BSON data of the document at `index`.
+        """
+        value_p = self._get_value_p(index)
+        return ctypes.string_at(value_p, c.bson.size2(value_p))
+
+    def raw(self, view=False):
+        """Iterate through raw BSON data of documents, without decoding.
+
+        :param view: Yield read-only `memoryview` instances into the result
+            set instead of copying the data into `bytes`. Each view keeps the
+            cursor alive.
+        """
+        for i in range(len(self)):
+            value_p = self._get_value_p(i)
+            if view:
+                yield bson.data_view(value_p, owner=self)
+            elif isinstance(value_p, six.binary_type):
+                yield value_p
+            else:
+                yield ctypes.string_at(value_p, c.bson.size2(value_p))
+
+    def to_columns(self, fields):
+        """Decode top-level `fields` of all documents into columns.
+
+        Documents are not built, and only the given fields are decoded.
+
+        :returns: An ordered mapping of field names to
+            :class:`bson.Column` instances, each containing a list of values
+            (`None` if missing) and a list of booleans marking missing values.
+        """
+        options = dict(self._options)
+        if options.get('binary_view'):
+            options['owner'] = self
+        datas = (self._get_value_p(i) for i in range(len(self)))
+        return bson.decode_columns(datas, fields, **options)
+
+    def to_numpy(self, fields):
+        """Like :func:`to_columns`, but with columns as NumPy arrays.
+
+        Columns are typed if the data is homogeneous. Requires NumPy. See
+        :func:`bson.column_to_numpy` for details.
+        """
+        return collections.OrderedDict(
+            (name, bson.column_to_numpy(column))
+            for name, column in self.to_columns(fields).items()
+        )
+
+    def to_pandas(self, fields):
+        """Decode top-level `fields` of all documents into a DataFrame.
+
+        Missing values are NaN (or NaT) in numeric (or datetime) columns, and
+        `None` otherwise. Requires pandas.
+        """
+        import numpy
+        import pandas
+
+        data = collections.OrderedDict()
+        for name, (values, mask) in self.to_numpy(fields).items():
+            if mask.any():
+                if values.dtype.kind in 'iu':
+                    values = values.astype(numpy.float64)
+                elif values.dtype.kind == 'b':
+                    values = values.astype(object)
+                if values.dtype.kind == 'f':
+                    values[mask] = numpy.nan
+                elif values.dtype.kind == 'M':
+                    values[mask] = numpy.datetime64('NaT')
+                else:
+                    values[mask] = None
+            data[name] = values
+        return pandas.DataFrame(data, columns=list(data))
+
+
+class CachedCursor(Cursor):
+    """Cursor over a result set served from the query cache.
+
+    The result set is held as a list of BSON data in Python, so there is no
+    `TCLIST *` behind this cursor.
+    """
+    def __init__(self, blobs, codec=None, options=None):
+        # Skip `CObjectWrapper.__init__` since there is nothing to free.
+        self._wrapped = None
+        self._blobs = blobs
+        self._len = len(blobs)
+        self._i = 0
+        self._codec = codec
+        self._options = options or {}
+
+    def _get_value_p(self, index):
+        return self._blobs[index]
+
 
 class Transaction(object):
 
@@ -205,6 +515,162 @@ class Transaction(object):
             self._collection.commit_transaction()
 
 
+class BulkLoad(object):
+    """Context manager returned by :func:`Collection.bulk_load`.
+    """
+    def __init__(self, collection):
+        super(BulkLoad, self).__init__()
+        self._collection = collection
+        self.indexes = []
+
+    def __enter__(self):
+        collection = self._collection
+        collection.restore_indexes()    # Left over by an interrupted load.
+        self.indexes = collection._get_index_specs()
+        if self.indexes:
+            _write_index_journal(
+                collection._index_journal_path, self.indexes,
+            )
+        for path in sorted(set(path for path, _ in self.indexes)):
+            collection.remove_index(path)
+        return collection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._collection.restore_indexes()
+        return False    # Do not swallow the exception.
+
+
+class IndexMaintenance(object):
+    """Background index maintenance of a database, returned by
+    :func:`Database.schedule_maintenance`.
+
+    Every `interval` seconds, a pass is started in a background thread that
+    maintains indexes of each collection in turn (see
+    :func:`Collection.maintain_indexes`), waiting `pause` seconds between
+    collections. If the current time leaves all `windows`, the pass is
+    suspended, and continued from the next collection on a later tick.
+
+    :ivar passes: Number of passes completed.
+    """
+    def __init__(self, database, operation, interval, collections, windows,
+                 pause, progress):
+        super(IndexMaintenance, self).__init__()
+        self._database_ref = weakref.ref(database)
+        self.operation = operation
+        self.interval = interval
+        self.collections = collections
+        self.windows = windows
+        self.pause = pause
+        self.progress = progress
+        self.passes = 0
+        self._pending = []
+        self._total = 0
+        self._stopped = threading.Event()
+        self._timer = PeriodicTimer(interval, self.run)
+
+    def start(self):
+        """Start running passes in the background.
+        """
+        self._timer.start()
+
+    def stop(self):
+        """Stop running passes. This waits for the index being maintained, if
+        any, to finish.
+        """
+        self._stopped.set()
+        self._timer.stop()
+
+    def run(self):
+        """Run a pass, or continue a suspended one, in the current thread.
+
+        `progress`, if given, is called with the collection name, the number
+        of collections done in this pass, and the total, before each
+        collection is maintained, and with `None` in place of the name when
+        the pass completes.
+
+        :returns: `False` if the database is gone, to stop the timer.
+        """
+        database = self._database_ref()
+        if database is None:
+            return False
+        if not database.is_open():
+            return
+        if not self._pending:
+            names = self.collections
+            if names is None:
+                names = sorted(database.collection_names)
+            self._pending = [coerce_str(name) for name in names]
+            self._total = len(self._pending)
+        while self._pending:
+            if self._stopped.is_set() or not _in_windows(
+                    self.windows, datetime.datetime.now()):
+                return
+            name = self._pending[0]
+            if self.progress is not None:
+                self.progress(name, self._total - len(self._pending),
+                              self._total)
+            try:
+                database[name].maintain_indexes(self.operation)
+            except DatabaseError as e:
+                warnings.warn(
+                    'Index maintenance of {name} failed: {e}'.format(
+                        name=name, e=e,
+                    ),
+                    RuntimeWarning,
+                )
+            self._pending.pop(0)
+            if self._pending and self._stopped.wait(self.pause):
+                return
+        if self.progress is not None:
+            self.progress(None, self._total, self._total)
+        self.passes += 1
+
+
+class _CollectionState(object):
+    """Python-side state of a collection.
+
+    A new :class:`Collection` is instantiated on every lookup, so anything
+    that needs to live between lookups is kept here, and shared through the
+    database.
+    """
+    def __init__(self):
+        super(_CollectionState, self).__init__()
+        self.document_cache = None
+        self.query_cache = None
+        self.generation = 0
+        self.codec = None
+        self.document_class = None
+
+    def invalidate(self, oid=None):
+        """Forget cached data about the document with `oid`, or about all
+        documents if `oid` is `None`.
+
+        This bumps the write generation, so every cached query result is
+        invalidated as well.
+        """
+        self.generation += 1
+        if self.document_cache is None:
+            return
+        if oid is None:
+            self.document_cache.clear()
+        else:
+            self.document_cache.discard(six.text_type(oid).lower())
+
+    def cache_document(self, key, data, generation):
+        """Put document data looked up under write `generation` into the
+        document cache, unless a write has happened since.
+
+        A write racing with :func:`put` may invalidate before the entry is
+        stored, so the generation is checked again afterwards.
+        """
+        cache = self.document_cache
+        if cache is None or self.generation != generation:
+            return
+        cache.put(key, data, len(data))
+        if self.generation != generation:
+            cache.discard(key)
+
+
 class Collection(object):
     """Representation of a collection inside a database.
 
@@ -216,6 +682,7 @@ class Collection(object):
         super(Collection, self).__init__()
         self._database = database
         self._wrapped = wrapped
+        self._state = database._get_collection_state(self.name)
 
     def __repr__(self):
         return '<Collection {name}>'.format(name=self.name)
@@ -236,6 +703,113 @@ class Collection(object):
     def drop(self):
         self.database.drop_collection(self.name)
 
+    @property
+    def document_class(self):
+        """Callable to build decoded documents with.
+
+        Defaults to the database's :attr:`Database.document_class`. Set this
+        to override it for all :class:`Collection` instances of this
+        collection. See :class:`bson.DecodeOptions` for possible values.
+        """
+        document_class = self._state.document_class
+        if document_class is None:
+            document_class = self._database.document_class
+        return document_class
+
+    @document_class.setter
+    def document_class(self, document_class):
+        self._state.document_class = document_class
+
+    def _pop_decode_options(self, kwargs):
+        """Pop decode options from keyword arguments of a retrieval method.
+        """
+        options = {}
+        for name in ('document_class', 'binary_view', 'numeric_arrays'):
+            value = kwargs.pop(name, None)
+            if value:
+                options[name] = value
+        if 'document_class' not in options and self.document_class:
+            options['document_class'] = self.document_class
+        return options
+
+    def register_schema(self, schema):
+        """Register the layout of documents in this collection.
+
+        Encoders and decoders specialized for the layout are generated with
+        :func:`bson.compile_codec`, and used by all :class:`Collection`
+        instances of this collection in this database. Documents not matching
+        the layout are still handled by the generic encoder and decoder.
+
+        :param schema: See :func:`bson.compile_codec`. Pass `None` to
+            unregister the schema.
+        :returns: The generated :class:`bson.Codec`, or `None`.
+        """
+        if schema is None:
+            self._state.codec = None
+        else:
+            self._state.codec = bson.compile_codec(schema)
+        return self._state.codec
+
+    def enable_cache(self, maxsize=1024, maxbytes=None, ttl=None):
+        """Cache documents looked up by OID in this collection.
+
+        Once enabled, lookups in the form of `find_one({'_id': oid})` are
+        served from memory if possible. Writes through any :class:`Collection`
+        instance of this database invalidate the cache. Writes from other
+        processes are *not* detected.
+
+        :param maxsize: Maximum number of documents cached.
+        :param maxbytes: Maximum total BSON size of documents cached.
+        :param ttl: Seconds a cached document stays valid.
+        """
+        self._state.document_cache = LRUCache(
+            maxsize=maxsize, maxbytes=maxbytes, ttl=ttl,
+        )
+
+    def disable_cache(self):
+        """Stop caching documents, and drop all cached documents.
+        """
+        self._state.document_cache = None
+
+    def cache_info(self):
+        """Get statistics of the document cache as a :class:`CacheInfo`, or
+        `None` if the cache is not enabled.
+        """
+        cache = self._state.document_cache
+        if cache is None:
+            return None
+        return cache.info()
+
+    def enable_query_cache(self, maxsize=128, maxbytes=None, ttl=None):
+        """Cache results of :func:`find` and :func:`count` in this collection.
+
+        Results are keyed by the encoded queries and hints. Every write
+        through a :class:`Collection` instance of this database bumps a write
+        generation of the collection, which invalidates all cached results.
+        Writes from other processes are *not* detected.
+
+        :param maxsize: Maximum number of results cached.
+        :param maxbytes: Maximum total BSON size of results cached.
+        :param ttl: Seconds a cached result stays valid.
+        """
+        self._state.query_cache = LRUCache(
+            maxsize=maxsize, maxbytes=maxbytes, ttl=ttl,
+        )
+
+    def disable_query_cache(self):
+        """Stop caching query results, and drop all cached results.
+        """
+        self._state.query_cache = None
+
+    def query_cache_info(self):
+        """Get statistics of the query cache as a :class:`CacheInfo`, or
+        `None` if the cache is not enabled.
+        """
+        cache = self._state.query_cache
+        if cache is None:
+            return None
+        return cache.info()
+
     def is_in_transaction(self):
         in_tran = ctypes.c_bool()
         c.ejdb.transtatus(self._wrapped, ctypes.byref(in_tran))
@@ -285,18 +859,39 @@ class Collection(object):
         if not self.is_in_transaction():
             raise TransactionError('Not in a transaction.')
         ok = c.ejdb.tranabort(self._wrapped)
+        self._state.invalidate()
         if not ok:
             raise TransactionError('Could not abort transaction.')
 
-    def _perform_save(self, document, merge):
-        bs = bson.encode(document)
-        oid = c.BSONOID()
+    def _perform_save(self, document, merge, oid=None, into=None):
+        """Save `document`, and return the `BSONOID` it is saved with.
+
+        :param oid: An :class:`bson.ObjectId` to save the document with. The
+            document should not contain an `_id` in this case.
+        :param into: A `BSONOID` for EJDB to write the saved OID into. A new
+            one is created if not given.
+        """
+        bs = bson.encode(document, oid=oid, codec=self._state.codec)
+        if into is None:
+            into = c.BSONOID()
         ok = c.ejdb.savebson2(
-            self._wrapped, bs._wrapped, ctypes.byref(oid), merge,
+            self._wrapped, bs._wrapped, ctypes.byref(into), merge,
         )
         if not ok:
             raise DatabaseError(_get_errmsg(self.database))
-        return oid
+        self._state.invalidate(into)
+        return into
+
+    def _load(self, oid):
+        """Load the document matching the `BSONOID` `oid`.
+
+        :returns: A :class:`bson.BSON` instance owning the loaded data, or
+            `None` if no document matches.
+        """
+        wrapped = c.ejdb.loadbson(self._wrapped, ctypes.byref(oid))
+        if not wrapped:
+            return None
+        return bson.BSON(wrapped)
 
     def _insert(self, document):
         try:
@@ -304,9 +899,8 @@ class Collection(object):
         except KeyError:
             pass
         else:
-            oid = c.BSONOID.from_string(doc_id)
-            bsdata = c.ejdb.loadbson(self._wrapped, ctypes.byref(oid))
-            if bsdata:  # Matching OID exists.
+            oid = _to_bsonoid(doc_id)
+            if self._load(oid) is not None:  # Matching OID exists.
                 raise OperationError(
                     'Could not insert document. Matching OID exists.'
                 )
@@ -324,50 +918,148 @@ class Collection(object):
     def insert_many(self, documents):
         """Insert a list of documents.
 
+        OIDs of documents without an `_id` are generated up front, so they
+        are saved without a collision check, and without converting OIDs
+        written back by EJDB.
+
         :returns: A list of OIDs of the inserted documents.
         """
+        ids = []
+        scratch = c.BSONOID()
         with self.begin_transaction():
-            ids = [
-                six.text_type(self._insert(document))
-                for document in documents
-            ]
+            for document in documents:
+                if (c.JDBIDKEYNAME in document or
+                        bson.ID_KEY_NAME in document):
+                    ids.append(six.text_type(self._insert(document)))
+                    continue
+                oid = bson.generate_oid()
+                self._perform_save(document, False, oid=oid, into=scratch)
+                ids.append(six.text_type(oid))
         return ids
 
-    def _execute(self, queries, hints, flags, query_items=None):
+    def _encode_queries(self, queries, hints, query_items=None):
         query = query_items or {}
         if queries:
             query.update({k: v for k, v in queries[0].items()})
             queries = queries[1:]
-        query_bs = bson.encode(query, as_query=True)
+        queries = (query,) + tuple(queries)
+        query_bss = [bson.encode(obj, as_query=True) for obj in queries]
         hints_bs = bson.encode(hints, as_query=True)
+        return queries, query_bss, hints_bs
 
-        extra_query_count = len(queries)
+    def _execute_encoded(self, queries, query_bss, hints, hints_bs, flags):
+        extra_query_count = len(query_bss) - 1
         if extra_query_count:
             BSONREF_ARR = c.BSONREF * extra_query_count
             extra_query_bs_array = BSONREF_ARR(*(
-                bson.encode(obj, as_query=True)._wrapped for obj in queries
+                bs._wrapped for bs in query_bss[1:]
             ))
         else:
             extra_query_bs_array = c.BSONREF(0)
 
         ejq = c.ejdb.createquery(
-            self._database._wrapped, query_bs._wrapped,
+            self._database._wrapped, query_bss[0]._wrapped,
             extra_query_bs_array, extra_query_count, hints_bs._wrapped,
         )
         if ejq is None:
-            queries = (query,) + queries
             raise CommandError(
                 'Could not build query from {qs} with hints {hs}.'.format(
                     qs=queries, hs=hints,
                 )
             )
         count = ctypes.c_uint32()
-        tclist_p = c.ejdb.qryexecute(
-            self._wrapped, ejq, ctypes.byref(count), flags, c.TCXSTRREF(0),
-        )
-        c.ejdb.querydel(ejq)
+        recorder = self._database._query_recorder
+        if recorder is None:
+            tclist_p = c.ejdb.qryexecute(
+                self._wrapped, ejq, ctypes.byref(count), flags,
+                c.TCXSTRREF(0),
+            )
+            c.ejdb.querydel(ejq)
+        else:
+            log = c.tc.xstrnew() if recorder.explain else c.TCXSTRREF(0)
+            started = time.time()
+            try:
+                tclist_p = c.ejdb.qryexecute(
+                    self._wrapped, ejq, ctypes.byref(count), flags, log,
+                )
+                seconds = time.time() - started
+                message = None
+                if log:
+                    message = coerce_str(ctypes.string_at(
+                        c.tc.xstrptr(log), c.tc.xstrsize(log),
+                    ))
+            finally:
+                if log:
+                    c.tc.xstrdel(log)
+                c.ejdb.querydel(ejq)
+            recorder.record(
+                self, queries, hints, flags, count.value, seconds, message,
+            )
+        if _is_update(queries):
+            self._state.invalidate()
         return tclist_p, count.value
 
+    def _execute(self, queries, hints, flags, query_items=None):
+        queries, query_bss, hints_bs = self._encode_queries(
+            queries, hints, query_items,
+        )
+        return self._execute_encoded(
+            queries, query_bss, hints, hints_bs, flags,
+        )
+
+    def _execute_cached(self, queries, hints, flags, options=None):
+        """Execute a query through the query cache, if it is enabled.
+
+        Returns a 2-tuple of a cursor (`None` if `flags` contains
+        `JBQRYCOUNT`) and the result count. `options` are passed to the
+        cursor to decode documents with.
+        """
+        count_only = bool(flags & c.JBQRYCOUNT)
+        cache = self._state.query_cache
+        queries, query_bss, hints_bs = self._encode_queries(queries, hints)
+        if cache is None or _is_update(queries):
+            tclist_p, count = self._execute_encoded(
+                queries, query_bss, hints, hints_bs, flags,
+            )
+            if count_only:
+                return None, count
+            cursor = Cursor(
+                wrapped=tclist_p, count=count, codec=self._state.codec,
+                options=options,
+            )
+            return cursor, count
+
+        # Read the generation before executing, so that a concurrent write
+        # can only make the stored result unreachable, not wrong.
+        key = (self._state.generation, flags, hints_bs.data) + tuple(
+            bs.data for bs in query_bss
+        )
+        result = cache.get(key)
+        if result is not None:
+            if count_only:
+                return None, result
+            cursor = CachedCursor(
+                result, codec=self._state.codec, options=options,
+            )
+            return cursor, len(result)
+
+        tclist_p, count = self._execute_encoded(
+            queries, query_bss, hints, hints_bs, flags,
+        )
+        if count_only:
+            cache.put(key, count)
+            return None, count
+        cursor = Cursor(
+            wrapped=tclist_p, count=count, codec=self._state.codec,
+            options=options,
+        )
+        if cache.maxbytes is None or sum(
+                c.bson.size2(cursor._get_value_p(i))
+                for i in range(count)) <= cache.maxbytes:
+            blobs = [cursor._get_data(i) for i in range(count)]
+            cache.put(key, blobs, sum(len(data) for data in blobs))
+        return cursor, count
+
     def count(self, *queries, **kwargs):
         """count(*queries, hints={})
 
@@ -376,15 +1068,22 @@ class Collection(object):
         :param hints: A mapping of possible hints to the selection.
         """
         # TODO: Document hints, implement MongoDB-like hinting kwargs.
-        tclist_p, count = self._execute(queries, kwargs, flags=c.JBQRYCOUNT)
+        _, count = self._execute_cached(queries, kwargs, flags=c.JBQRYCOUNT)
         return count
 
     def find_one(self, *queries, **kwargs):
-        """find_one(*queries, hints={})
+        """find_one(*queries, hints={}, document_class=None, binary_view=False,
+        numeric_arrays=None)
 
         Find a single document in the collection.
 
         :param hints: A mapping of possible hints to the selection.
+        :param document_class: Callable to build the document with. Defaults
+            to :attr:`document_class`.
+        :param binary_view: Decode binary fields as `memoryview` instances
+            without copying.
+        :param numeric_arrays: Decode homogeneous numeric arrays in bulk, into
+            `'array'` or `'numpy'` arrays. See :class:`bson.DecodeOptions`.
         :returns: A mapping for the document found, or `None` if no matching
             document exists.
         """
@@ -392,26 +1091,103 @@ class Collection(object):
         # TODO: Add a flag to choose whether we should raise
         # DocumentDoesNotExist or return None with an empty result.
         hints = kwargs.pop('hints', {})
+        options = self._pop_decode_options(kwargs)
+        cache = self._state.document_cache
+        oid = None
+        if cache is not None:
+            oid = _get_cacheable_oid(queries, hints)
+        if oid is not None:
+            data = cache.get(oid)
+            if data is not None:
+                return bson.decode_data(
+                    data, codec=self._state.codec, **options
+                )
+        # Read before the lookup, so a write in between is noticed.
+        generation = self._state.generation
         tclist_p, count = self._execute(queries, hints, flags=c.JBQRYFINDONE)
-        cursor = Cursor(wrapped=tclist_p, count=count)
+        cursor = Cursor(
+            wrapped=tclist_p, count=count, codec=self._state.codec,
+            options=options,
+        )
+        if oid is not None and count:
+            self._state.cache_document(oid, cursor._get_data(0), generation)
         try:
             document = cursor[0]
         except IndexError:
             document = None
         return document
 
+    def find_raw(self, *queries, **kwargs):
+        """find_raw(*queries, hints={}, view=False)
+
+        Find documents in the collection, without decoding them.
+
+        :param hints: A mapping of possible hints to the selection.
+        :param view: See :func:`Cursor.raw`.
+        :returns: An iterator of BSON data of each document found.
+        """
+        hints = kwargs.pop('hints', {})
+        view = kwargs.pop('view', False)
+        cursor, _ = self._execute_cached(queries, hints, flags=0)
+        return cursor.raw(view=view)
+
     def find(self, *queries, **kwargs):
-        """find(*queries, hints={})
+        """find(*queries, hints={}, document_class=None, binary_view=False,
+        numeric_arrays=None)
 
         Find documents in the collection.
 
         :param hints: A mapping of possible hints to the selection.
+        :param document_class: Callable to build documents with. Defaults to
+            :attr:`document_class`.
+        :param binary_view: Decode binary fields as `memoryview` instances
+            without copying.
+        :param numeric_arrays: Decode homogeneous numeric arrays in bulk, into
+            `'array'` or `'numpy'` arrays. See :class:`bson.DecodeOptions`.
         :returns: A :class:`Cursor` instance corresponding to this query.
         """
         # TODO: Document hints, implement MongoDB-like hinting kwargs.
         hints = kwargs.pop('hints', {})
-        tclist_p, count = self._execute(queries, hints, flags=0)
-        return Cursor(wrapped=tclist_p, count=count)
+        options = self._pop_decode_options(kwargs)
+        cursor, _ = self._execute_cached(
+            queries, hints, flags=0, options=options,
+        )
+        return cursor
+
+    def get(self, oid):
+        """Get the document with the given OID.
+
+        The document is loaded directly by its primary key, skipping query
+        building and execution. The document cache is used if enabled.
+
+        :returns: A mapping for the document, or `None` if no document with
+            the OID exists.
+        """
+        options = self._pop_decode_options({})
+        cache = self._state.document_cache
+        if cache is not None:
+            key = six.text_type(oid).lower()
+            data = cache.get(key)
+            if data is not None:
+                return bson.decode_data(
+                    data, codec=self._state.codec, **options
+                )
+        # Read before the lookup, so a write in between is noticed.
+        generation = self._state.generation
+        bs = self._load(_to_bsonoid(oid))
+        if bs is None:
+            return None
+        if cache is not None:
+            self._state.cache_document(key, bs.data, generation)
+        return bs.decode(codec=self._state.codec, **options)
+
+    def get_many(self, oids):
+        """Get documents with the given OIDs.
+
+        :returns: A list of documents in the same order as `oids`. `None` is
+            put in place of each OID without a matching document.
+        """
+        return [self.get(oid) for oid in oids]
 
     def delete_one(self, *queries, **kwargs):
         """delete_one(*queries, hints={})
@@ -473,18 +1249,363 @@ class Collection(object):
                 document.pop(bson.ID_KEY_NAME, None)
                 document[c.JDBIDKEYNAME] = six.text_type(oid)
 
+    def save_raw(self, *datas, **kwargs):
+        """save_raw(*datas, merge=False)
+
+        Persist one or more documents already encoded as BSON.
+
+        The data are validated, and saved without being decoded (or copied,
+        if possible). A document without an `_id` field gets a generated one.
+
+        :param datas: `bytes` instances, or objects supporting the buffer
+            protocol, each containing a complete BSON document.
+        :param merge: See :func:`save`.
+        :returns: A list of OIDs the documents are saved with.
+        """
+        merge = kwargs.pop('merge', False)
+        bss = [bson.BSON.from_buffer(data) for data in datas]
+        return self._save_bsons(bss, merge)
+
+    def _save_bsons(self, bss, merge):
+        """Save finished :class:`bson.BSON` instances in a transaction.
+
+        The data are trusted, i.e. either validated or loaded from EJDB.
+        Returns a list of OIDs the documents are saved with.
+        """
+        oids = []
+        with self.begin_transaction():
+            for bs in bss:
+                oid = c.BSONOID()
+                ok = c.ejdb.savebson2(
+                    self._wrapped, bs._wrapped, ctypes.byref(oid), merge,
+                )
+                if not ok:
+                    raise DatabaseError(_get_errmsg(self.database))
+                self._state.invalidate(oid)
+                oids.append(six.text_type(oid))
+        return oids
+
     def remove(self, oid):
         """Remove the document matching the given OID from the collection.
 
         This method is provided for compatibility with `ejdb-python`.
         """
-        if not is_valid_oid(oid):
-            raise ValueError('OID should be a 24-character-long hex string.')
-        oid = c.BSONOID.from_string(oid)
+        oid = _to_bsonoid(oid)
         ok = c.ejdb.rmbson(self._wrapped, oid)
+        self._state.invalidate(oid)
         if not ok:
             raise DatabaseError(_get_errmsg(self.database))
 
+    def remove_many(self, oids, batch_size=1000):
+        """Remove documents matching the given OIDs from the collection.
+
+        All OIDs are validated before anything is removed. Documents are then
+        removed in transactions, each containing at most `batch_size` of them.
+        Transactions already committed are not rolled back if a later one
+        fails.
+
+        :returns: Count of documents actually removed. OIDs without a matching
+            document are not counted.
+        """
+        oids = [_to_bsonoid(oid) for oid in oids]
+        removed = 0
+        try:
+            for start in six.moves.range(0, len(oids), batch_size):
+                with self.begin_transaction(allow_nested=True):
+                    before = self._get_record_count()
+                    for oid in oids[start:start + batch_size]:
+                        ok = c.ejdb.rmbson(self._wrapped, oid)
+                        if not ok:
+                            raise DatabaseError(_get_errmsg(self.database))
+                    removed += before - self._get_record_count()
+        finally:
+            self._state.invalidate()
+        return removed
+
+    def _iter_loaded_pages(self, batch_size):
+        """Scan the collection, yielding lists of :class:`bson.BSON` of at
+        most `batch_size` documents, as loaded by EJDB.
+
+        Primary keys are read page by page from the underlying table
+        database's iterator, and each page of documents is loaded by OID, so
+        only one page is held in memory. Documents written during the scan
+        may or may not be included.
+        """
+        tdb = self._wrapped.contents.tdb
+        if not c.tc.tdbiterinit(tdb):   # pragma: no cover
+            raise DatabaseError(_get_errmsg(self.database))
+        size = ctypes.c_int()
+        while True:
+            oids = []
+            while len(oids) < batch_size:
+                key_p = c.tc.tdbiternext(tdb, ctypes.byref(size))
+                if not key_p:
+                    break
+                try:
+                    if size.value == ctypes.sizeof(c.BSONOID):
+                        oids.append(c.BSONOID.from_buffer_copy(
+                            ctypes.string_at(key_p, size.value),
+                        ))
+                finally:
+                    c.tc.free(key_p)
+            page = []
+            for oid in oids:
+                bs = self._load(oid)
+                if bs is not None:  # Removed after the key is read.
+                    page.append(bs)
+            if page:
+                yield page
+            if len(oids) < batch_size:
+                return
+
+    def _iter_raw_pages(self, batch_size):
+        """Like :func:`_iter_loaded_pages`, but yield BSON data as `bytes`.
+        """
+        for page in self._iter_loaded_pages(batch_size):
+            yield [bs.data for bs in page]
+
+    def export_jsonl(self, fp, batch_size=1000):
+        """Write documents in this collection to `fp` as JSON Lines.
+
+        The collection is scanned page by page, so at most `batch_size`
+        documents are held in memory. Values not representable in JSON are
+        written in Extended JSON, see :mod:`ejdb.extjson`.
+
+        :param fp: A file-like object opened in text mode.
+        :returns: The number of documents written.
+        """
+        count = 0
+        for page in self._iter_raw_pages(batch_size):
+            fp.writelines(
+                extjson.dumps(bson.decode_data(data, object_id=True)) + '\n'
+                for data in page
+            )
+            count += len(page)
+        return count
+
+    def import_jsonl(self, fp, batch_size=1000):
+        """Insert documents read from JSON Lines in `fp`.
+
+        Lines are parsed lazily, and inserted with :func:`insert_many` in
+        transactions of `batch_size` documents. Extended JSON values are
+        converted, see :mod:`ejdb.extjson`. Blank lines are skipped.
+
+        :param fp: A file-like object opened in text mode.
+        :returns: The number of documents inserted.
+        """
+        count = 0
+        batch = []
+        for lineno, line in enumerate(fp, 1):
+            if not line.strip():
+                continue
+            try:
+                batch.append(extjson.loads(line))
+            except ValueError as e:
+                raise ValueError('Invalid JSON on line {0}: {1}'.format(
+                    lineno, e,
+                ))
+            if len(batch) >= batch_size:
+                count += len(self.insert_many(batch))
+                batch = []
+        if batch:
+            count += len(self.insert_many(batch))
+        return count
+
+    def export_parquet(self, path, fields=None, schema=None,
+                       batch_size=10000, **kwargs):
+        """Write top-level `fields` of documents in this collection into a
+        Parquet file. Requires pyarrow.
+
+        The collection is scanned page by page, and each page of at most
+        `batch_size` documents is decoded into columns (see
+        :func:`bson.decode_columns`) and written as a row group, so memory
+        use is bounded by the batch size. Missing values are written as
+        nulls.
+
+        :param fields: Names of fields to write. Defaults to names in
+            `schema`.
+        :param schema: A :class:`pyarrow.Schema` to convert values into. It
+            may contain fields not in `fields`. If not given, it is inferred
+            from the first page, so fields whose types are not apparent from
+            that page (e.g. only missing values, or integers in a field that
+            also holds floats) should be declared.
+        :returns: The number of documents written.
+        :raises ValueError: If values of a field cannot be converted into its
+            type. No file is left at `path` in this case.
+
+        Other keyword arguments are passed to
+        :class:`pyarrow.parquet.ParquetWriter`, e.g. `compression`.
+        """
+        import pyarrow
+        import pyarrow.parquet
+
+        if fields is None:
+            if schema is None:
+                raise TypeError('Either fields or schema is required.')
+            fields = schema.names
+        fields = list(fields)
+        inferred = schema is None
+        if not inferred:
+            schema = pyarrow.schema([schema.field(name) for name in fields])
+
+        def convert(name, values):
+            if schema is None:
+                return pyarrow.array(values)
+            type_ = schema.field(name).type
+            try:
+                return pyarrow.array(values, type=type_)
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError) as e:
+                raise ValueError(
+                    'Could not convert field {name!r} into {type}{hint}: '
+                    '{e}'.format(
+                        name=name, type=type_, e=e,
+                        hint=' (inferred from the first page, declare it '
+                             'in schema instead)' if inferred else '',
+                    )
+                )
+
+        # Write into a temporary file, so a failure does not leave a
+        # truncated file behind.
+        temp_path = path + '.tmp'
+        count = 0
+        writer = None
+        try:
+            for page in self._iter_raw_pages(batch_size):
+                columns = bson.decode_columns(page, fields)
+                arrays = [convert(name, columns[name].values)
+                          for name in fields]
+                if schema is None:
+                    schema = pyarrow.schema([
+                        (name, array.type)
+                        for name, array in zip(fields, arrays)
+                    ])
+                if writer is None:
+                    writer = pyarrow.parquet.ParquetWriter(
+                        temp_path, schema, **kwargs
+                    )
+                writer.write_table(
+                    pyarrow.Table.from_arrays(arrays, schema=schema),
+                )
+                count += len(page)
+            if writer is None:  # Nothing to write, but still make a file.
+                if schema is None:
+                    schema = pyarrow.schema([
+                        (name, pyarrow.null()) for name in fields
+                    ])
+                writer = pyarrow.parquet.ParquetWriter(
+                    temp_path, schema, **kwargs
+                )
+            writer.close()
+            writer = None
+            getattr(os, 'replace', os.rename)(temp_path, path)
+        finally:
+            if writer is not None:
+                writer.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return count
+
+    def load_dump(self, path, batch_size=1000, merge=False):
+        """Load documents from a file of concatenated BSON, such as one
+        written by ``mongodump`` or :func:`bson.write_file`.
+
+        The file is memory-mapped, and documents are saved without decoding
+        with :func:`save_raw`, in transactions each containing at most
+        `batch_size` of them. Transactions already committed are not rolled
+        back if a later one fails.
+
+        :param merge: See :func:`save`.
+        :returns: The number of documents saved.
+        """
+        count = 0
+        batch = []
+        for data in bson.iter_file(path):
+            batch.append(data)
+            if len(batch) >= batch_size:
+                count += len(self.save_raw(*batch, merge=merge))
+                batch = []
+        if batch:
+            count += len(self.save_raw(*batch, merge=merge))
+        return count
+
+    def _get_meta(self):
+        """Get metadata of this collection from :func:`Database._get_meta`.
+        """
+        for meta in self.database._get_meta().get('collections', []):
+            if meta.get('name') == self.name:
+                return meta
+        return {}   # pragma: no cover
+
+    def _get_index_specs(self):
+        """Get (path, index type) of indexes in this collection.
+        """
+        return [(index.path, index.type) for index in self.indexes()]
+
+    def stats(self):
+        """Get statistics of this collection, as reported by EJDB.
+
+        This reads metadata kept in memory by EJDB, and sizes of files, so it
+        is cheap enough to be polled.
+
+        :returns: A :class:`CollectionStats` instance.
+        """
+        return _make_collection_stats(self._get_meta())
+
+    def indexes(self):
+        """List indexes in this collection.
+
+        :returns: A list of :class:`IndexInfo` instances.
+        """
+        return self.stats().indexes
+
+    def _get_record_count(self):
+        # O(1) count from the underlying table database. This includes
+        # changes made in an ongoing transaction.
+        return c.tc.tdbrnum(self._wrapped.contents.tdb)
+
+    @property
+    def _index_journal_path(self):
+        return '{path}_{name}.bulkload'.format(
+            path=self.database.path, name=self.name,
+        )
+
+    def bulk_load(self):
+        """Defer index updates while loading documents into the collection.
+
+        Use this as a context manager::
+
+            with collection.bulk_load():
+                collection.insert_many(documents)
+
+        Indexes of the collection are recorded into a journal file next to
+        the database, and dropped when the block is entered. They are
+        recreated and optimized when the block exits, even with an
+        exception. Building an index once is much faster than updating it on
+        every save.
+
+        If the process dies inside the block, the journal is left behind,
+        and the indexes are restored by :func:`restore_indexes`, which is
+        also called when :func:`bulk_load` is entered again.
+        """
+        return BulkLoad(self)
+
+    def restore_indexes(self):
+        """Restore indexes dropped by an interrupted :func:`bulk_load`.
+
+        Indexes recorded in the journal are recreated and optimized, and the
+        journal is removed. Does nothing if there is no journal.
+
+        :returns: A list of (path, index type) of indexes restored.
+        """
+        journal_path = self._index_journal_path
+        specs = _read_index_journal(journal_path)
+        for path, index_type in specs:
+            self.create_index(path, index_type)
+            self.optimize_index(path, index_type)
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+        return specs
+
     def create_index(self, path, index_type):
         _set_index(self, 'add', path, index_type)
 
@@ -501,7 +1622,8 @@ class Collection(object):
             )
             if not ok:
                 raise DatabaseError(_get_errmsg(self.database))
-        _set_index(self, 'remove', path, index_type, flags=c.JBIDXDROP)
+        else:
+            _set_index(self, 'remove', path, index_type, flags=c.JBIDXDROP)
 
     def rebuild_index(self, path, index_type):
         _set_index(self, 'rebuild', path, index_type, flags=c.JBIDXREBLD)
@@ -555,7 +1677,27 @@ class Collection(object):
         self.optimize_index(path, NUMBER)
 
     def optimize_array_index(self, path):
-        self.remove_index(path, ARRAY)
+        self.optimize_index(path, ARRAY)
+
+    def maintain_indexes(self, operation=MAINTENANCE_OPTIMIZE):
+        """Optimize or rebuild all indexes in this collection.
+
+        Each index is maintained with the flags of its own type.
+
+        :param operation: :data:`MAINTENANCE_OPTIMIZE` or
+            :data:`MAINTENANCE_REBUILD`.
+        :returns: A list of (path, index type) of indexes maintained.
+        """
+        try:
+            flags = _MAINTENANCE_FLAGS[operation]
+        except KeyError:
+            raise ValueError(
+                'Invalid maintenance operation {0!r}.'.format(operation),
+            )
+        specs = self._get_index_specs()
+        for path, index_type in specs:
+            _set_index(self, operation, path, index_type, flags=flags)
+        return specs
 
 
 class CollectionIterator(tc.ListIterator):
@@ -582,16 +1724,34 @@ class Database(CObjectWrapper):
     The database is opened immediately, unless the `path` argument evalutes to
     `False`. In such cases the user needs to set the path and manually call
     :func:`open` later.
+
+    `durability` controls how often data is synchronized to disk. It can be
+    one of :data:`DURABILITY_NONE`, :data:`DURABILITY_INTERVAL` (sync every
+    `sync_interval` seconds in a background thread), or
+    :data:`DURABILITY_EVERY_TRANSACTION`. If not given, the :data:`SYNC` flag
+    in `options` decides.
+
+    `document_class` is used to build documents read from collections in the
+    database, e.g. `dict`. See :class:`bson.DecodeOptions` for details.
     """
     @_init_c
-    def __init__(self, path='', options=READ):
-        """__init__(path='', options=READ)
+    def __init__(self, path='', options=READ, durability=None,
+                 sync_interval=5.0, document_class=None):
+        """__init__(path='', options=READ, durability=None, sync_interval=5.0,
+        document_class=None)
         """
         super(Database, self).__init__(
             wrapped=c.ejdb.new(), finalizer=_ejdb_finalizer,
         )
         self._path = coerce_str(path)
         self._options = options
+        self._sync_timer = None
+        self._collection_states = {}
+        self._query_recorder = None     # See `ejdb.advisor`.
+        self._maintenance = None
+        self.durability = durability
+        self.sync_interval = sync_interval
+        self.document_class = document_class
         if self.path:
             self.open()
 
@@ -646,6 +1806,28 @@ class Database(CObjectWrapper):
             raise DatabaseError('Could not set options to an open database.')
         self._options = options
 
+    @property
+    def durability(self):
+        """Durability level of the EJDB.
+
+        This can be modified if the database instance is not opened.
+        """
+        return self._durability
+
+    @durability.setter
+    def durability(self, durability):
+        if self.is_open():
+            raise DatabaseError(
+                'Could not set durability to an open database.'
+            )
+        if durability is not None and durability not in _DURABILITY_LEVELS:
+            raise ValueError(
+                'Durability should be one of {levels}.'.format(
+                    levels=', '.join(repr(v) for v in _DURABILITY_LEVELS),
+                )
+            )
+        self._durability = durability
+
     @property
     def writable(self):
         return bool(self.options & WRITE)
@@ -704,15 +1886,32 @@ class Database(CObjectWrapper):
             raise DatabaseError('Database already opened.')
 
         path = coerce_char_p(self.path)
-        ok = c.ejdb.open(self._wrapped, path, self.options)
+        options = self.options
+        if self.durability == DURABILITY_EVERY_TRANSACTION:
+            options |= SYNC
+        elif self.durability is not None:
+            options &= ~SYNC
+        ok = c.ejdb.open(self._wrapped, path, options)
         if not ok:
             raise DatabaseError(_get_errmsg(self))
 
+        if self.durability == DURABILITY_INTERVAL:
+            self._sync_timer = PeriodicTimer(
+                self.sync_interval,
+                functools.partial(_sync_database, weakref.ref(self)),
+            )
+            self._sync_timer.start()
+
     def close(self):
         """Close this EJDB.
         """
         if not self.is_open():
             raise DatabaseError('Database not opened.')
+        if self._sync_timer is not None:
+            self._sync_timer.stop()
+            self._sync_timer = None
+        self.stop_maintenance()
+        self._collection_states.clear()
         ok = c.ejdb.close(self._wrapped)
         if not ok:  # pragma: no cover
             raise DatabaseError(_get_errmsg(self))
@@ -723,6 +1922,16 @@ class Database(CObjectWrapper):
         open_state = c.ejdb.isopen(self._wrapped)
         return open_state
 
+    def sync(self):
+        """Synchronize the whole EJDB, including all collections and indexes,
+        to disk.
+        """
+        if not self.is_open():
+            raise DatabaseError('Database not opened.')
+        ok = c.ejdb.syncdb(self._wrapped)
+        if not ok:
+            raise DatabaseError(_get_errmsg(self))
+
     def create_collection(self, name, exist_ok=False, **options):
         """Create a collection in this database with given options.
 
@@ -757,6 +1966,229 @@ class Database(CObjectWrapper):
             raise DatabaseError(_get_errmsg(self))
         return Collection(database=self, wrapped=wrapped)
 
+    def copy_collection(self, src, dst, options=None, dst_db=None,
+                        batch_size=1000):
+        """Copy documents and indexes of a collection into a new collection.
+
+        Documents are saved as loaded by EJDB, without being decoded or
+        copied into Python, in transactions of `batch_size` documents.
+        Indexes of the source are created on the new collection after all
+        documents are copied.
+
+        :param src: Name of the collection to copy.
+        :param dst: Name of the collection to create.
+        :param options: A mapping of collection options to create the new
+            collection with. See :func:`create_collection`. Options not given
+            are copied from the source.
+        :param dst_db: A :class:`Database` to create the new collection in.
+            Defaults to this database.
+        :returns: The new :class:`Collection`.
+        """
+        source = self.get_collection(src)
+        if dst_db is None:
+            dst_db = self
+        if dst_db is self and coerce_str(src) == coerce_str(dst):
+            raise ValueError('Could not copy a collection into itself.')
+        source_options = source._get_meta().get('options', {})
+        collection_options = {
+            name: source_options[name]
+            for name in ('large', 'compressed', 'cachedrecords')
+            if name in source_options
+        }
+        collection_options.update(options or {})
+        target = dst_db.create_collection(dst, **collection_options)
+        # Loaded documents are saved as-is, without copying or validation.
+        for page in source._iter_loaded_pages(batch_size):
+            target._save_bsons(page, merge=False)
+        for path, index_type in source._get_index_specs():
+            target.create_index(path, index_type)
+        return target
+
+    def _dump(self, func, path, names, flags, progress):
+        names = [coerce_str(name) for name in names]
+        timings = collections.OrderedDict()
+        log = c.tc.xstrnew()
+        started = time.time()
+        try:
+            for i, name in enumerate(names):
+                if progress is not None:
+                    progress(name, i, len(names))
+                cnames = c.tc.listnew()
+                c.tc.listpush2(cnames, coerce_char_p(name))
+                collection_started = time.time()
+                try:
+                    ok = func(
+                        self._wrapped, coerce_char_p(path), cnames, flags, log,
+                    )
+                finally:
+                    c.tc.listdel(cnames)
+                if not ok:
+                    raise DatabaseError(_get_errmsg(self))
+                timings[name] = time.time() - collection_started
+            if progress is not None:
+                progress(None, len(names), len(names))
+            message = ctypes.string_at(
+                c.tc.xstrptr(log), c.tc.xstrsize(log),
+            )
+        finally:
+            c.tc.xstrdel(log)
+        return DumpReport(
+            collections=timings, seconds=time.time() - started,
+            log=coerce_str(message),
+        )
+
+    def export(self, path, collections=None, format='bson', progress=None):
+        """Dump collections into files in directory `path`, with `ejdbexport`.
+
+        Each collection is dumped into a data file and a metadata file, named
+        after the collection.
+
+        :param collections: Names of collections to export. All collections
+            are exported if not given.
+        :param format: Either `'bson'` or `'json'`. Only BSON dumps can be
+            imported with :func:`import_`.
+        :param progress: A callable, called with the name of the collection,
+            the number of exported collections, and the total number of
+            collections, before each collection is exported. It is called
+            with `None` as the name after the export finishes.
+        :returns: A :class:`DumpReport`.
+        """
+        try:
+            flags = _EXPORT_FORMATS[format]
+        except KeyError:
+            raise ValueError('Invalid export format {0!r}.'.format(format))
+        if collections is None:
+            collections = sorted(self.collection_names)
+        return self._dump(c.ejdb.export, path, collections, flags, progress)
+
+    def import_(self, path, collections=None, mode=IMPORT_UPDATE,
+                progress=None):
+        """Load collections dumped by :func:`export` in directory `path`, with
+        `ejdbimport`. Only dumps in the BSON format can be imported.
+
+        :param collections: Names of collections to import. All collections
+            found in `path` are imported if not given.
+        :param mode: How to handle collections already in the database.
+            :data:`IMPORT_UPDATE` (the default) updates existing documents
+            with imported ones. :data:`IMPORT_REPLACE` recreates the
+            collections.
+        :param progress: See :func:`export`.
+        :returns: A :class:`DumpReport`.
+        :raises ValueError: If a collection is not dumped in `path` in the
+            BSON format.
+        """
+        try:
+            flags = _IMPORT_MODES[mode]
+        except KeyError:
+            raise ValueError('Invalid import mode {0!r}.'.format(mode))
+        if collections is None:
+            suffix = '-meta.json'
+            collections = sorted(
+                filename[:-len(suffix)] for filename in os.listdir(path)
+                if filename.endswith(suffix)
+            )
+        for name in collections:
+            data_path = os.path.join(path, coerce_str(name))
+            if os.path.exists(data_path + '.bson'):
+                continue
+            if os.path.exists(data_path + '.json'):
+                raise ValueError(
+                    'Collection {0!r} is dumped as JSON, which cannot be '
+                    'imported. Export it in the BSON format.'.format(name)
+                )
+            raise ValueError('Collection {0!r} is not dumped in {1}.'.format(
+                name, path,
+            ))
+        try:
+            return self._dump(
+                c.ejdb.import_, path, collections, flags, progress,
+            )
+        finally:
+            for name in collections:
+                state = self._collection_states.get(coerce_str(name))
+                if state is not None:
+                    state.invalidate()
+
+    def schedule_maintenance(self, interval=3600.0,
+                             operation=MAINTENANCE_OPTIMIZE, collections=None,
+                             windows=None, pause=1.0, progress=None):
+        """Maintain indexes in a background thread, one collection at a time.
+
+        This replaces maintenance previously scheduled. Maintenance is
+        stopped when the database is closed. See :class:`IndexMaintenance`.
+
+        :param interval: Seconds between passes over the collections.
+        :param operation: :data:`MAINTENANCE_OPTIMIZE` or
+            :data:`MAINTENANCE_REBUILD`.
+        :param collections: Names of collections to maintain. Defaults to
+            all collections at the start of each pass.
+        :param windows: A list of (start, end) `datetime.time` pairs in local
+            time. Maintenance only runs in these windows. A window wraps
+            around midnight if its end is before its start. Defaults to
+            always.
+        :param pause: Seconds to wait between collections, leaving the
+            database to other work.
+        :param progress: Callable reporting progress. See
+            :func:`IndexMaintenance.run`.
+        :returns: The :class:`IndexMaintenance` instance, already started.
+        """
+        if operation not in _MAINTENANCE_FLAGS:
+            raise ValueError(
+                'Invalid maintenance operation {0!r}.'.format(operation),
+            )
+        if collections is not None:
+            collections = [coerce_str(name) for name in collections]
+        if windows is not None:
+            windows = list(windows)
+        self.stop_maintenance()
+        self._maintenance = IndexMaintenance(
+            self, operation=operation, interval=interval,
+            collections=collections, windows=windows, pause=pause,
+            progress=progress,
+        )
+        self._maintenance.start()
+        return self._maintenance
+
+    def stop_maintenance(self):
+        """Stop maintenance scheduled by :func:`schedule_maintenance`, if
+        any.
+        """
+        if self._maintenance is not None:
+            self._maintenance.stop()
+            self._maintenance = None
+
+    def _get_meta(self):
+        """Get metadata of this database, as reported by `ejdbmeta`.
+        """
+        wrapped = c.ejdb.meta(self._wrapped)
+        if not wrapped:     # pragma: no cover
+            raise DatabaseError(_get_errmsg(self))
+        return bson.BSON(wrapped).decode()
+
+    def stats(self):
+        """Get statistics of this database and its collections, as reported
+        by EJDB.
+
+        This reads metadata kept in memory by EJDB, and sizes of files, so it
+        is cheap enough to be polled.
+
+        :returns: A :class:`DatabaseStats` instance.
+        """
+        meta = self._get_meta()
+        collections_stats = collections.OrderedDict()
+        for collection_meta in meta.get('collections', []):
+            stats = _make_collection_stats(collection_meta)
+            collections_stats[stats.name] = stats
+        file = meta.get('file', self.path)
+        sizes = [_get_file_size(file)]
+        for stats in collections_stats.values():
+            sizes.append(stats.size)
+            sizes.extend(index.size for index in stats.indexes)
+        return DatabaseStats(
+            file=file, size=sum(size for size in sizes if size is not None),
+            collections=collections_stats,
+        )
+
     def drop_collection(self, name, unlink=True):
         """Drop a collection in this database.
 
@@ -768,9 +2200,19 @@ class Database(CObjectWrapper):
         """
         c_name = coerce_char_p(name)
         ok = c.ejdb.rmcoll(self._wrapped, c_name, unlink)
+        self._collection_states.pop(coerce_str(name), None)
         if not ok:  # pragma: no cover
             raise DatabaseError(_get_errmsg(self))
 
+    def _get_collection_state(self, name):
+        try:
+            state = self._collection_states[name]
+        except KeyError:
+            state = self._collection_states.setdefault(
+                name, _CollectionState(),
+            )
+        return state
+
     def get_collection(self, name):
         """Get the collection with name `name` inside this EJDB.
         """
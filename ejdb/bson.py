@@ -2,18 +2,28 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import absolute_import, division, unicode_literals
+import array
 import binascii
 import collections
 import copy
 import ctypes
 import datetime
 import hashlib
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
 import uuid
 
 import six
 
 from . import c
-from .utils import CObjectWrapper, PrettyOrderedDict, coerce_char_p, coerce_str
+from .utils import (
+    CObjectWrapper, PrettyOrderedDict, coerce_char_p, coerce_str,
+    python_2_unicode_compatible,
+)
 
 
 HASH = type(hashlib.md5())
@@ -48,6 +58,267 @@ class MD5(six.binary_type):
         return coerce_str(binascii.hexlify(self))
 
 
+@python_2_unicode_compatible
+class ObjectId(object):
+    """Value type for an EJDB object ID.
+
+    An object ID is kept as its 12-byte binary representation, and only
+    converted to a `BSONOID` when passed into C. The first four bytes are a
+    big-endian timestamp, so object IDs sort by creation time.
+
+    :param oid: A 24-character-long hex string, the 12 bytes of an OID,
+        another :class:`ObjectId`, or a `BSONOID`. A new unique object ID is
+        generated if this is `None`.
+    """
+    __slots__ = ('_binary', '_hash')
+
+    def __init__(self, oid=None):
+        if oid is None:
+            binary = _generator.generate()
+        elif isinstance(oid, ObjectId):
+            binary = oid._binary
+        elif isinstance(oid, c.BSONOID):
+            binary = oid.binary
+        elif isinstance(oid, six.binary_type) and len(oid) == 12:
+            binary = oid
+        elif isinstance(oid, (six.text_type, six.binary_type)):
+            binary = c.parse_oid_string(oid)
+        else:
+            raise TypeError(
+                'Could not create ObjectId from {oid}.'.format(oid=repr(oid))
+            )
+        self._binary = binary
+
+    @classmethod
+    def _from_binary(cls, binary):
+        # Fast path for the decoder, skipping type checks.
+        oid = cls.__new__(cls)
+        oid._binary = binary
+        return oid
+
+    def __str__(self):
+        return binascii.hexlify(self._binary).decode('ascii')
+
+    def __repr__(self):
+        return 'ObjectId({s})'.format(s=repr(str(self)))
+
+    def __reduce__(self):
+        return (ObjectId, (self._binary,))
+
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash(self._binary)
+        return self._hash
+
+    def __eq__(self, other):
+        if isinstance(other, ObjectId):
+            return self._binary == other._binary
+        return NotImplemented
+
+    def __ne__(self, other):
+        if isinstance(other, ObjectId):
+            return self._binary != other._binary
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, ObjectId):
+            return self._binary < other._binary
+        return NotImplemented
+
+    def __le__(self, other):
+        if isinstance(other, ObjectId):
+            return self._binary <= other._binary
+        return NotImplemented
+
+    def __gt__(self, other):
+        if isinstance(other, ObjectId):
+            return self._binary > other._binary
+        return NotImplemented
+
+    def __ge__(self, other):
+        if isinstance(other, ObjectId):
+            return self._binary >= other._binary
+        return NotImplemented
+
+    @property
+    def binary(self):
+        """The 12 bytes of this object ID.
+        """
+        return self._binary
+
+    @property
+    def generation_time(self):
+        """Time this object ID was generated, as a naive UTC datetime.
+        """
+        timestamp, = struct.unpack('>I', self._binary[:4])
+        return datetime.datetime.utcfromtimestamp(timestamp)
+
+    def to_bsonoid(self):
+        """Convert this object ID to a `BSONOID` to pass into C.
+        """
+        return c.BSONOID.from_buffer_copy(self._binary)
+
+
+class _ObjectIdGenerator(object):
+    """Thread- and fork-safe generator of unique OID bytes.
+
+    Each OID is made of a 4-byte big-endian timestamp in seconds, 5 random
+    bytes unique to the process, and a 3-byte big-endian counter starting at
+    a random value. The random parts are re-seeded when a fork is detected.
+    """
+    def __init__(self):
+        super(_ObjectIdGenerator, self).__init__()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._process = b''
+        self._counter = 0
+
+    def _reseed(self):
+        self._pid = os.getpid()
+        self._process = os.urandom(5)
+        self._counter, = struct.unpack('>I', b'\x00' + os.urandom(3))
+
+    def generate(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reseed()
+            self._counter = (self._counter + 1) & 0xFFFFFF
+            counter = self._counter
+            process = self._process
+        timestamp = int(time.time()) & 0xFFFFFFFF
+        return (
+            struct.pack('>I', timestamp) + process +
+            struct.pack('>I', counter)[1:]
+        )
+
+
+_generator = _ObjectIdGenerator()
+
+
+def generate_oid():
+    """Generate a new unique :class:`ObjectId`, without calling into C.
+    """
+    return ObjectId._from_binary(_generator.generate())
+
+
+DecodeOptions = collections.namedtuple('DecodeOptions', [
+    'object_id', 'document_class', 'binary_view', 'owner', 'numeric_arrays',
+])
+"""Options controlling how BSON is decoded.
+
+:param object_id: Decode OIDs as :class:`ObjectId` instead of hex strings.
+:param document_class: Callable to build documents and sub-documents with.
+    It is called with a list of (key, value) pairs, so mapping types like
+    `dict` and `collections.OrderedDict` work, as well as factories from
+    :func:`record_factory`.
+:param binary_view: Decode generic binary fields as read-only `memoryview`
+    instances into the BSON data, instead of copying them into `bytes`. Each
+    view keeps the data it points into alive.
+:param owner: Object keeping the BSON data alive, referenced by each view
+    when `binary_view` is set. This is filled automatically.
+:param numeric_arrays: Decode arrays containing only doubles, only 32-bit
+    integers, or only 64-bit integers in bulk, instead of item by item. Can
+    be `'array'` (decode to `array.array`), `'numpy'` (decode to
+    `numpy.ndarray`; requires NumPy), or `None` (decode to `list`).
+"""
+
+DEFAULT_DECODE_OPTIONS = DecodeOptions(
+    object_id=False,
+    document_class=PrettyOrderedDict,
+    binary_view=False,
+    owner=None,
+    numeric_arrays=None,
+)
+
+
+def _make_decode_options(options):
+    if not options:
+        return DEFAULT_DECODE_OPTIONS
+    if options.get('document_class', True) is None:
+        options = dict(options, document_class=PrettyOrderedDict)
+    return DEFAULT_DECODE_OPTIONS._replace(**options)
+
+
+class Record(object):
+    """Base class of compact records built by :func:`record_factory`.
+    """
+    __slots__ = ()
+    _fields = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self._fields, values):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return '{name}({fields})'.format(
+            name=type(self).__name__,
+            fields=', '.join(
+                '{0}={1!r}'.format(name, getattr(self, name))
+                for name in self._fields
+            ),
+        )
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name)
+            for name in self._fields
+        )
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __getitem__(self, key):
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def _asdict(self):
+        return collections.OrderedDict(
+            (name, getattr(self, name)) for name in self._fields
+        )
+
+
+def record_factory(fields, name='Record', fallback=dict):
+    """Create a `document_class` decoding documents into compact records.
+
+    Records store fields in `__slots__` instead of a per-instance hash table,
+    saving memory on large result sets of documents with a fixed layout.
+
+    :param fields: Names of fields in the layout. The `_id` field should be
+        included if documents are read from a collection.
+    :param name: Name of the generated record class.
+    :param fallback: Used to build (sub-)documents not containing exactly
+        the given fields.
+    :returns: A callable usable as `document_class`. The record class is
+        available as its `record_class` attribute.
+    """
+    fields = tuple(coerce_str(f) for f in fields)
+    if len(set(fields)) != len(fields):
+        raise ValueError('Duplicate field names in record.')
+    record_class = type(str(name), (Record,), {
+        '__slots__': fields, '_fields': fields,
+    })
+    field_set = frozenset(fields)
+
+    def factory(pairs):
+        values = dict(pairs)
+        if len(values) != len(fields) or not field_set.issuperset(values):
+            return fallback(pairs)
+        return record_class(*[values[f] for f in fields])
+
+    factory.record_class = record_class
+    return factory
+
+
 def _datetime_to_millis(value):
     epoch = datetime.datetime.utcfromtimestamp(0)
     delta = value - epoch
@@ -55,128 +326,542 @@ def _datetime_to_millis(value):
     return millis
 
 
+def _bson_encode_null(key, value, into):
+    return c.bson.append_null(into, key)
+
+
+def _bson_encode_oid(key, value, into):
+    oid = value.to_bsonoid()
+    return c.bson.append_oid(into, key, ctypes.byref(oid))
+
+
+def _bson_encode_text(key, value, into):
+    value = coerce_char_p(value)
+    if key == ID_KEY_NAME:
+        oid = c.BSONOID.from_string(value)
+        return c.bson.append_oid(into, key, ctypes.byref(oid))
+    return c.bson.append_string_n(into, key, value, len(value))
+
+
+def _bson_encode_bool(key, value, into):
+    return c.bson.append_bool(into, key, value)
+
+
+def _bson_encode_int(key, value, into):
+    if value > LONG_MAX:
+        return c.BSON_ERROR
+    elif value > INT_MAX:
+        return c.bson.append_long(into, key, value)
+    return c.bson.append_int(into, key, value)
+
+
+def _bson_encode_float(key, value, into):
+    return c.bson.append_double(into, key, value)
+
+
+def _bson_encode_datetime(key, value, into):
+    millis = _datetime_to_millis(value)
+    return c.bson.append_date(into, key, millis)
+
+
+def _bson_encode_date(key, value, into):
+    value = datetime.datetime.combine(value, datetime.datetime.min.time())
+    return _bson_encode_datetime(key, value, into)
+
+
+def _bson_encode_uuid(key, value, into):
+    data = value.bytes
+    return c.bson.append_binary(into, key, c.BSON_BIN_UUID, data, len(data))
+
+
+def _bson_encode_md5(key, value, into):
+    data = value.digest()
+    return c.bson.append_binary(into, key, c.BSON_BIN_MD5, data, len(data))
+
+
+def _as_c_buffer(value):
+    """Get a pointer-compatible object and size for a buffer-like `value`.
+
+    The data is not copied unless `value` is a read-only buffer other than
+    `bytes`, or not contiguous.
+    """
+    if isinstance(value, six.binary_type):
+        return value, len(value)
+    view = memoryview(value)
+    try:
+        size = view.nbytes
+    except AttributeError:  # pragma: no cover. Python 2.
+        size = len(view.tobytes())
+    if not size:
+        return b'', 0
+    # A contiguous view of the whole object can use the object directly.
+    obj = getattr(view, 'obj', None)
+    contiguous = getattr(view, 'c_contiguous', False)
+    if (contiguous and isinstance(obj, six.binary_type) and
+            len(obj) == size):
+        return obj, size
+    if (contiguous and isinstance(obj, ctypes.Array) and
+            ctypes.sizeof(obj) == size):
+        return obj, size    # E.g. a view from decoding with `binary_view`.
+    buftype = ctypes.c_char * size
+    try:
+        return buftype.from_buffer(view), size
+    except (TypeError, ValueError):     # Read-only or not contiguous.
+        return buftype.from_buffer_copy(view.tobytes()), size
+
+
+def _bson_encode_binary(key, value, into):
+    data, size = _as_c_buffer(value)
+    return c.bson.append_binary(into, key, c.BSON_BIN_BINARY, data, size)
+
+
+# Numeric arrays are encoded and decoded in bulk by treating the BSON array as
+# groups of fixed-size elements. In a valid BSON array of one element type,
+# elements with keys of the same number of digits ("0" to "9", "10" to "99",
+# etc.) have the same size, so each group can be (de)interleaved with a few
+# extended slice assignments instead of a loop over the items.
+
+# Value size of BSON types supported in numeric arrays.
+_NUMERIC_WIDTHS = {c.BSON_DOUBLE: 8, c.BSON_INT: 4, c.BSON_LONG: 8}
+
+
+def _find_array_typecode(kinds, itemsize):
+    for typecode in kinds:
+        try:
+            if array.array(typecode).itemsize == itemsize:
+                return typecode
+        except ValueError:  # pragma: no cover. No "q" on Python 2.
+            continue
+    return None     # pragma: no cover
+
+
+# Typecodes of `array.array` matching each BSON type, and the reverse.
+_ARRAY_TYPECODES = {
+    c.BSON_DOUBLE: 'd',
+    c.BSON_INT: _find_array_typecode('ilh', 4),
+    c.BSON_LONG: _find_array_typecode('qlL', 8),
+}
+_ARRAY_BSON_TYPES = {'d': c.BSON_DOUBLE}
+for _typecode in 'ilq':
+    try:
+        _itemsize = array.array(_typecode).itemsize
+    except ValueError:  # pragma: no cover. No "q" on Python 2.
+        continue
+    if _itemsize in (4, 8):
+        _ARRAY_BSON_TYPES[_typecode] = (
+            c.BSON_INT if _itemsize == 4 else c.BSON_LONG
+        )
+
+# NumPy dtypes matching each BSON type (all little-endian).
+_NUMPY_DTYPES = {c.BSON_DOUBLE: '<f8', c.BSON_INT: '<i4', c.BSON_LONG: '<i8'}
+
+# Concatenated keys of each digit group, e.g. b'10111213...99' for 2.
+_array_keys = {}
+
+
+def _get_array_keys(digits):
+    try:
+        return _array_keys[digits]
+    except KeyError:
+        pass
+    start = 10 ** (digits - 1) if digits > 1 else 0
+    keys = ''.join(
+        str(i) for i in six.moves.range(start, 10 ** digits)
+    ).encode('ascii')
+    if digits <= 5:     # Don't keep huge groups around.
+        _array_keys[digits] = keys
+    return keys
+
+
+def _iter_array_groups(count):
+    """Yield (digits, start, count) of each key group of an array.
+    """
+    digits = 1
+    start = 0
+    while start < count:
+        end = min(count, 10 ** digits)
+        yield digits, start, end - start
+        start = end
+        digits += 1
+
+
+def _pack_numeric_array(bson_type, values):
+    """Build BSON array data from little-endian `values` of `bson_type`.
+    """
+    width = _NUMERIC_WIDTHS[bson_type]
+    count = len(values) // width
+    type_byte = six.int2byte(bson_type)
+    chunks = []
+    for digits, start, n in _iter_array_groups(count):
+        stride = 2 + digits + width
+        chunk = bytearray(stride * n)
+        chunk[0::stride] = type_byte * n
+        keys = _get_array_keys(digits)[:digits * n]
+        for k in range(digits):
+            chunk[1 + k::stride] = keys[k::digits]
+        group = values[start * width:(start + n) * width]
+        for j in range(width):
+            chunk[2 + digits + j::stride] = group[j::width]
+        chunks.append(chunk)
+    body = bytearray().join(chunks)
+    return struct.pack('<i', len(body) + 5) + body + b'\x00'
+
+
+def _unpack_numeric_array(data):
+    """Extract values from BSON array `data` if all items are of one numeric
+    type. Returns a 2-tuple of the BSON type and little-endian values, or
+    `None` if the array does not qualify. An empty array does not qualify,
+    since its items could be of any type.
+    """
+    body = data[4:-1]
+    if not body:
+        return None
+    bson_type = six.indexbytes(body, 0)
+    try:
+        width = _NUMERIC_WIDTHS[bson_type]
+    except KeyError:
+        return None
+    type_byte = six.int2byte(bson_type)
+    chunks = []
+    pos = 0
+    digits = 1
+    capacity = 10
+    while pos < len(body):
+        stride = 2 + digits + width
+        n = min(capacity, (len(body) - pos) // stride)
+        group = body[pos:pos + n * stride]
+        if not n or (n < capacity and len(group) != len(body) - pos):
+            return None     # Sizes do not add up; not homogeneous.
+        if (group[0::stride] != type_byte * n or
+                group[1 + digits::stride] != b'\x00' * n):
+            return None
+        chunk = bytearray(n * width)
+        for j in range(width):
+            chunk[j::width] = group[2 + digits + j::stride]
+        chunks.append(chunk)
+        pos += n * stride
+        digits += 1
+        capacity = 10 ** digits - 10 ** (digits - 1)
+    return bson_type, bytearray().join(chunks)
+
+
+def _append_array_data(into, key, data):
+    # Wrap the array data in a document with a single field, and copy the
+    # field over with an iterator.
+    wrapper = b''.join([
+        struct.pack('<i', len(data) + 7), b'\x04\x00', bytes(data), b'\x00',
+    ])
+    it = c.BSONITERATOR()
+    c.bson.iterator_from_buffer(ctypes.byref(it), wrapper)
+    c.bson.iterator_next(ctypes.byref(it))
+    return c.bson.append_field_from_iterator2(key, ctypes.byref(it), into)
+
+
+def _bson_encode_array(key, value, into):
+    try:
+        bson_type = _ARRAY_BSON_TYPES[value.typecode]
+    except KeyError:    # Other typecodes are encoded item by item.
+        return _bson_encode_sequence(key, value, into)
+    if sys.byteorder != 'little':   # pragma: no cover
+        value = array.array(value.typecode, value)
+        value.byteswap()
+    data = _pack_numeric_array(bson_type, memoryview(value).tobytes())
+    return _append_array_data(into, key, data)
+
+
+def _bson_encode_ndarray(key, value, into):
+    kind = value.dtype.kind
+    if value.ndim != 1 or kind not in 'iuf':
+        return _bson_encode_sequence(key, value.tolist(), into)
+    if kind == 'f':
+        bson_type = c.BSON_DOUBLE
+    elif value.dtype.itemsize < 4 or (
+            kind == 'i' and value.dtype.itemsize == 4):
+        bson_type = c.BSON_INT
+    elif kind == 'u' and value.dtype.itemsize == 8:
+        return _bson_encode_sequence(key, value.tolist(), into)
+    else:
+        bson_type = c.BSON_LONG
+    values = value.astype(_NUMPY_DTYPES[bson_type], copy=False).tobytes()
+    data = _pack_numeric_array(bson_type, values)
+    return _append_array_data(into, key, data)
+
+
+def _is_ndarray_type(type_):
+    return type_.__module__ == 'numpy' and type_.__name__ == 'ndarray'
+
+
+def _iter_mapping_items(value):
+    return ((k, value[k]) for k in value)
+
+
+def _iter_sequence_items(value):
+    return ((str(i), v) for i, v in enumerate(value))
+
+
+def _bson_encode_mapping(key, value, into):
+    r = c.bson.append_start_object(into, key)
+    if r != c.BSON_OK:  # pragma: no cover.
+        return r
+    _bson_encode_items(_iter_mapping_items(value), into)
+    return c.bson.append_finish_object(into)
+
+
+def _bson_encode_sequence(key, value, into):
+    r = c.bson.append_start_array(into, key)
+    if r != c.BSON_OK:  # pragma: no cover.
+        return r
+    _bson_encode_items(_iter_sequence_items(value), into)
+    return c.bson.append_finish_array(into)
+
+
+def _bson_encode_unsupported(key, value, into):
+    # TODO: Implement tolerence mode, insert undefined for objects not
+    # encodable. Or maybe use pickle to save the binary?
+    return c.BSON_ERROR
+
+
+# Encoders registered for types. An encoder is called with the key (as bytes),
+# the value, and the bson struct, and returns `BSON_OK` on success. Subclasses
+# of registered types use the encoder of the nearest class in their MRO.
+_ENCODERS = {
+    type(None): _bson_encode_null,
+    ObjectId: _bson_encode_oid,
+    six.text_type: _bson_encode_text,
+    bool: _bson_encode_bool,
+    float: _bson_encode_float,
+    datetime.datetime: _bson_encode_datetime,
+    datetime.date: _bson_encode_date,
+    uuid.UUID: _bson_encode_uuid,
+    HASH: _bson_encode_md5,
+    MD5: _bson_encode_md5,
+    six.binary_type: _bson_encode_binary,
+    bytearray: _bson_encode_binary,
+    memoryview: _bson_encode_binary,
+    array.array: _bson_encode_array,
+    dict: _bson_encode_mapping,
+    list: _bson_encode_sequence,
+    tuple: _bson_encode_sequence,
+}
+for _t in six.integer_types:
+    _ENCODERS[_t] = _bson_encode_int
+
+# Encoders for types not found in MRO lookup, checked with `issubclass` so
+# that virtual subclasses work.
+_ABSTRACT_ENCODERS = [
+    (collections.Mapping, _bson_encode_mapping),
+    (collections.Sequence, _bson_encode_sequence),
+]
+
+# Encoders resolved for exact types. This is cleared whenever an encoder is
+# registered.
+_encoder_cache = {}
+
+
+def _find_encoder(type_):
+    for klass in type_.__mro__:
+        try:
+            encoder = _ENCODERS[klass]
+        except KeyError:
+            continue
+        break
+    else:
+        for abstract_type, encoder in _ABSTRACT_ENCODERS:
+            if issubclass(type_, abstract_type):
+                break
+        else:
+            # Checked by name so NumPy needs not be imported.
+            if any(_is_ndarray_type(klass) for klass in type_.__mro__):
+                encoder = _bson_encode_ndarray
+            else:
+                encoder = _bson_encode_unsupported
+    _encoder_cache[type_] = encoder
+    return encoder
+
+
 def _bson_encode_element(key, value, into):
     key = coerce_char_p(key)
-    if value is None:
-        r = c.bson.append_null(into, key)
-    elif isinstance(value, six.text_type):
-        value = coerce_char_p(value)
-        if key == ID_KEY_NAME:
-            oid = c.BSONOID.from_string(value)
-            r = c.bson.append_oid(into, key, ctypes.byref(oid))
-        else:
-            r = c.bson.append_string_n(into, key, value, len(value))
-    elif isinstance(value, bool):
-        r = c.bson.append_bool(into, key, value)
-    elif isinstance(value, six.integer_types):
-        # Need to be after bool because bool is a subclass of int.
-        if value > LONG_MAX:
-            raise BSONEncodeError(value)
-        elif value > INT_MAX:
-            r = c.bson.append_long(into, key, value)
-        else:
-            r = c.bson.append_int(into, key, value)
-    elif isinstance(value, float):
-        r = c.bson.append_double(into, key, value)
-    elif isinstance(value, datetime.datetime):
-        millis = _datetime_to_millis(value)
-        r = c.bson.append_date(into, key, millis)
-    elif isinstance(value, datetime.date):
-        value = datetime.datetime.combine(value, datetime.datetime.min.time())
-        millis = _datetime_to_millis(value)
-        r = c.bson.append_date(into, key, millis)
-    elif isinstance(value, uuid.UUID):
-        data = value.bytes
-        r = c.bson.append_binary(into, key, c.BSON_BIN_UUID, data, len(data))
-    elif isinstance(value, (HASH, MD5,)):
-        data = value.digest()
-        r = c.bson.append_binary(into, key, c.BSON_BIN_MD5, data, len(data))
-    elif isinstance(value, six.binary_type):
-        # Need to be after MD5 because MD5 is a subclass of six.binary_type.
-        buf = ctypes.create_string_buffer(value, len(value))
-        r = c.bson.append_binary(into, key, c.BSON_BIN_BINARY, buf, len(value))
-    elif isinstance(value, collections.Mapping):
-        r = c.bson.append_start_object(into, key)
-        if r != c.BSON_OK:  # pragma: no cover.
-            raise BSONEncodeError(value)
-        for k in value:
-            _bson_encode_element(k, value[k], into)
-        r = c.bson.append_finish_object(into)
-        if r != c.BSON_OK:  # pragma: no cover.
-            raise BSONEncodeError(value)
-    elif isinstance(value, collections.Sequence):
-        r = c.bson.append_start_array(into, key)
-        if r != c.BSON_OK:  # pragma: no cover.
-            raise BSONEncodeError(value)
-        for i, v in enumerate(value):
-            _bson_encode_element(str(i), v, into)
-        r = c.bson.append_finish_array(into)
-        if r != c.BSON_OK:  # pragma: no cover.
-            raise BSONEncodeError(value)
-    else:
-        # TODO: Implement tolerence mode, insert undefined for objects not
-        # encodable. Or maybe use pickle to save the binary?
-        r = c.BSON_ERROR
+    try:
+        encoder = _encoder_cache[type(value)]
+    except KeyError:
+        encoder = _find_encoder(type(value))
+    r = encoder(key, value, into)
     if r != c.BSON_OK:
         raise BSONEncodeError(value)
 
 
-def _bson_decode_double(bsiter):
+def _bson_encode_items(items, into):
+    """Encode (key, value) pairs from iterator `items` into `into`.
+
+    Mappings and sequences are entered with an explicit stack instead of
+    recursion, so documents of any depth can be encoded.
+    """
+    encoder_cache = _encoder_cache
+    stack = [(items, None)]
+    while stack:
+        items = stack[-1][0]
+        for key, value in items:
+            key = coerce_char_p(key)
+            try:
+                encoder = encoder_cache[type(value)]
+            except KeyError:
+                encoder = _find_encoder(type(value))
+            if encoder is _bson_encode_mapping:
+                r = c.bson.append_start_object(into, key)
+                stack.append((
+                    _iter_mapping_items(value), c.bson.append_finish_object,
+                ))
+            elif encoder is _bson_encode_sequence:
+                r = c.bson.append_start_array(into, key)
+                stack.append((
+                    _iter_sequence_items(value), c.bson.append_finish_array,
+                ))
+            else:
+                r = encoder(key, value, into)
+            if r != c.BSON_OK:
+                raise BSONEncodeError(value)
+            if stack[-1][0] is not items:
+                break   # Continue with the items of the new container.
+        else:
+            _, finish = stack.pop()
+            if finish is not None and finish(into) != c.BSON_OK:
+                raise BSONEncodeError(items)  # pragma: no cover.
+
+
+def register_type(type_, encode):
+    """Register a hook to encode instances of `type_` (and its subclasses).
+
+    :param encode: A callable taking an instance of `type_`, and returning a
+        value that can be encoded in its place, e.g. `str` for
+        `decimal.Decimal`.
+    """
+    def _bson_encode_converted(key, value, into):
+        _bson_encode_element(key, encode(value), into)
+        return c.BSON_OK
+
+    _ENCODERS[type_] = _bson_encode_converted
+    _encoder_cache.clear()
+
+
+def register_binary_type(type_, subtype, encode, decode):
+    """Register hooks to save instances of `type_` as binary fields.
+
+    :param subtype: Binary subtype to use. User-defined subtypes should be in
+        the range of 128 (`BSON_BIN_USER`) to 255. Built-in subtypes cannot be
+        overridden.
+    :param encode: A callable taking an instance of `type_`, and returning
+        `bytes` to save.
+    :param decode: A callable taking `bytes` saved, and returning the decoded
+        value. This is called for every binary field of `subtype`.
+    """
+    if subtype in _BUILTIN_BIN_SUBTYPES or not 0 <= subtype <= 255:
+        raise ValueError(
+            'Could not register binary subtype {subtype}.'.format(
+                subtype=subtype,
+            )
+        )
+
+    def _bson_encode_custom_binary(key, value, into):
+        data = encode(value)
+        return c.bson.append_binary(into, key, subtype, data, len(data))
+
+    _ENCODERS[type_] = _bson_encode_custom_binary
+    _encoder_cache.clear()
+    _BIN_SUBTYPE_DECODERS[subtype] = decode
+
+
+def _bson_decode_double(bsiter, options):
     value = c.bson.iterator_double_raw(bsiter)
     return value
 
 
-def _bson_decode_int(bsiter):
+def _bson_decode_int(bsiter, options):
     value = c.bson.iterator_int_raw(bsiter)
     return value
 
 
-def _bson_decode_long(bsiter):
+def _bson_decode_long(bsiter, options):
     value = c.bson.iterator_long_raw(bsiter)
     return value
 
 
-def _bson_decode_bool(bsiter):
+def _bson_decode_bool(bsiter, options):
     value = c.bson.iterator_bool_raw(bsiter)
     return value
 
 
-def _bson_decode_oid(bsiter):
+def _bson_decode_oid(bsiter, options):
     oid_ref = c.bson.iterator_oid(bsiter)
-    oid_str = six.text_type(oid_ref.contents)
-    return oid_str
+    binary = ctypes.string_at(oid_ref, 12)
+    if options.object_id:
+        return ObjectId._from_binary(binary)
+    return binascii.hexlify(binary).decode('ascii')
 
 
-def _bson_decode_string(bsiter):
+def _bson_decode_string(bsiter, options):
     size = c.bson.iterator_string_len(bsiter)
     data_p = c.bson.iterator_string(bsiter)
     s = ctypes.string_at(data_p, size - 1)  # Minus NULL character.
     return coerce_str(s)
 
 
-def _bson_decode_date(bsiter):
+def _bson_decode_date(bsiter, options):
     timestamp = c.bson.iterator_date(bsiter)
     dt = datetime.datetime.utcfromtimestamp(timestamp / 1000)
     return dt
 
 
-def _bson_decode_array(bsiter):
-    subiter = c.bson.iterator_create()
-    c.bson.iterator_subiterator(bsiter, subiter)
-    arr = _bson_decode_array_contents(subiter)
-    c.bson.iterator_dispose(subiter)
-    return arr
+def _bson_decode_numeric_array(bsiter, options):
+    """Decode the array `bsiter` points to in bulk if it only contains items
+    of one numeric type. Returns `None` if it does not qualify.
+    """
+    value_p = c.bson.iterator_value(bsiter)
+    size = ctypes.c_int32.from_address(value_p).value
+    # Check the type of the first item before copying the whole array.
+    if size <= 5 or (ctypes.c_ubyte.from_address(value_p + 4).value not in
+                     _NUMERIC_WIDTHS):
+        return None
+    result = _unpack_numeric_array(ctypes.string_at(value_p, size))
+    if result is None:
+        return None
+    bson_type, values = result
+    kind = options.numeric_arrays
+    if kind == 'numpy':
+        import numpy
+        return numpy.frombuffer(values, dtype=_NUMPY_DTYPES[bson_type])
+    elif kind == 'array':
+        arr = array.array(_ARRAY_TYPECODES[bson_type])
+        if six.PY3:     # pragma: no cover
+            arr.frombytes(bytes(values))
+        else:           # pragma: no cover
+            arr.fromstring(bytes(values))
+        if sys.byteorder != 'little':   # pragma: no cover
+            arr.byteswap()
+        return arr
+    raise ValueError(
+        "numeric_arrays should be 'array', 'numpy', or None, not {0!r}".format(
+            kind,
+        )
+    )
+
 
+def _bson_decode_array(bsiter, options):
+    if options.numeric_arrays:
+        arr = _bson_decode_numeric_array(bsiter, options)
+        if arr is not None:
+            return arr
+    subiter = c.BSONITERATOR()
+    c.bson.iterator_subiterator(bsiter, ctypes.byref(subiter))
+    return _bson_decode_contents(ctypes.byref(subiter), options, True)
 
-def _bson_decode_object(bsiter):
-    subiter = c.bson.iterator_create()
-    c.bson.iterator_subiterator(bsiter, subiter)
-    obj = _bson_decode_object_contents(subiter)
-    c.bson.iterator_dispose(subiter)
-    return obj
 
+def _bson_decode_object(bsiter, options):
+    subiter = c.BSONITERATOR()
+    c.bson.iterator_subiterator(bsiter, ctypes.byref(subiter))
+    return _bson_decode_contents(ctypes.byref(subiter), options, False)
 
-def _bson_decode_binary(bsiter):
+
+def _bson_decode_binary(bsiter, options):
     subtype = c.bson.iterator_bin_type(bsiter)
     try:
         subdecoder = _BIN_SUBTYPE_DECODERS[subtype]
@@ -184,26 +869,53 @@ def _bson_decode_binary(bsiter):
         raise BSONDecodeError(
             'Could not decode binary with key {key} of type {subtype}'.format(
                 key=coerce_str(c.bson.iterator_key(bsiter)),
-                subtype=_BIN_SUBTYPE_NAMES[subtype],
+                subtype=_BIN_SUBTYPE_NAMES.get(subtype, subtype),
             )
         )
     size = c.bson.iterator_bin_len(bsiter)
     data_p = c.bson.iterator_bin_data(bsiter)
+    if options.binary_view and subtype == c.BSON_BIN_BINARY:
+        return _make_view(data_p, size, options.owner)
     data = ctypes.string_at(data_p, size=size)
     return subdecoder(data)
 
 
+def data_view(data, owner=None):
+    """Get a read-only `memoryview` of BSON data without copying it.
+
+    :param data: A `bytes` instance, or a `c_void_p` pointing to the data.
+    :param owner: Object keeping the data alive if `data` is a pointer. The
+        view holds a reference to it.
+    """
+    if isinstance(data, six.binary_type):
+        return memoryview(data)
+    return _make_view(data, c.bson.size2(data), owner)
+
+
+def _make_view(data_p, size, owner):
+    if not size:
+        return memoryview(b'')
+    buf = (ctypes.c_ubyte * size).from_address(data_p)
+    buf._owner = owner   # Keep the data alive as long as the view.
+    view = memoryview(buf)
+    if six.PY3:     # pragma: no cover
+        view = view.cast('B')
+        if hasattr(view, 'toreadonly'):     # Python 3.8+.
+            view = view.toreadonly()
+    return view
+
+
 _TYPE_DECODERS = {
     c.BSON_DOUBLE: _bson_decode_double,
     c.BSON_STRING: _bson_decode_string,
     c.BSON_OBJECT: _bson_decode_object,
     c.BSON_ARRAY: _bson_decode_array,
     c.BSON_BINDATA: _bson_decode_binary,
-    c.BSON_UNDEFINED: lambda i: None,
+    c.BSON_UNDEFINED: lambda i, o: None,
     c.BSON_OID: _bson_decode_oid,
     c.BSON_BOOL: _bson_decode_bool,
     c.BSON_DATE: _bson_decode_date,
-    c.BSON_NULL: lambda i: None,
+    c.BSON_NULL: lambda i, o: None,
     c.BSON_INT: _bson_decode_int,
     c.BSON_LONG: _bson_decode_long,
 }
@@ -236,60 +948,213 @@ _BIN_SUBTYPE_DECODERS = {
     c.BSON_BIN_MD5: MD5,
 }
 
-_BIN_SUBTYPE_NAMES = [
-    'BSON_BIN_BINARY',
-    'BSON_BIN_FUNC',
-    'BSON_BIN_BINARY_OLD',
-    'BSON_BIN_UUID',
-    'BSON_BIN_MD5',
-    'BSON_BIN_USER',
-]
+_BUILTIN_BIN_SUBTYPES = frozenset(_BIN_SUBTYPE_DECODERS)
 
+_BIN_SUBTYPE_NAMES = {
+    c.BSON_BIN_BINARY: 'BSON_BIN_BINARY',
+    c.BSON_BIN_FUNC: 'BSON_BIN_FUNC',
+    c.BSON_BIN_BINARY_OLD: 'BSON_BIN_BINARY_OLD',
+    c.BSON_BIN_UUID: 'BSON_BIN_UUID',
+    c.BSON_BIN_MD5: 'BSON_BIN_MD5',
+    c.BSON_BIN_USER: 'BSON_BIN_USER',
+}
 
-def _bson_decode_array_contents(subiter):
-    subitems = []
-    while True:
-        value_type = c.bson.iterator_next(subiter)
-        if value_type == c.BSON_EOO:
-            break
-        key = coerce_str(c.bson.iterator_key(subiter))
-        try:
-            key = int(key)
-            assert key == len(subitems)
-        except (AssertionError, ValueError):    # pragma: no cover
-            # Error if the keys are not integers representing array indexes.
-            # This shouldn't happen if the BSON object is valid.
-            # TODO: Better error message.
-            raise BSONDecodeError
-        try:
-            decoder = _TYPE_DECODERS[value_type]
-        except KeyError:    # pragma: no cover
-            raise BSONDecodeError(
-                'Could not decode object with key {key} of type {type}'.format(
-                    key=key, type=_TYPE_NAMES[value_type],
-                )
-            )
-        subitems.append(decoder(subiter))
-    return subitems
 
+# Decoded keys, indexed by their raw bytes. Documents in a result set usually
+# share field names, so this saves decoding the same keys over and over, and
+# lets all documents share one string object per key. The cache is simply
+# emptied when it grows too large.
+_KEY_CACHE_MAXSIZE = 4096
+_KEY_CACHE_MAX_KEY_LENGTH = 256
+_key_cache = {}
 
-def _bson_decode_object_contents(subiter):
-    subitems = PrettyOrderedDict()
+
+def _decode_key(raw):
+    try:
+        return _key_cache[raw]
+    except KeyError:
+        pass
+    key = coerce_str(raw)
+    if len(raw) > _KEY_CACHE_MAX_KEY_LENGTH:
+        return key
+    if six.PY3:     # Python 2 cannot intern unicode.
+        key = sys.intern(key)
+    if len(_key_cache) >= _KEY_CACHE_MAXSIZE:
+        _key_cache.clear()
+    _key_cache[raw] = key
+    return key
+
+
+def _bson_decode_contents(bsiter, options, is_array=False):
+    """Decode the object (or array) `bsiter` iterates through.
+
+    Sub-objects and arrays are entered with an explicit stack instead of
+    recursion, so documents of any depth can be decoded. Iterators into
+    sub-objects are allocated in Python, one per depth, and reused for
+    siblings, so no C allocation is needed while decoding.
+
+    Keys of a valid BSON array are always "0", "1", etc., so they are not
+    read at all. Items are appended by position.
+    """
+    iterator_next = c.bson.iterator_next
+    iterator_key = c.bson.iterator_key
+    iterator_subiterator = c.bson.iterator_subiterator
+    document_class = options.document_class
+    decoders = _TYPE_DECODERS
+    key_cache = _key_cache
+    containers = (c.BSON_OBJECT, c.BSON_ARRAY)
+    numeric_arrays = options.numeric_arrays
+
+    # Iterator references, indexed by depth.
+    iterators = [bsiter]
+    # Stack of (items, is_array, key in parent) of containers being decoded.
+    stack = [([], is_array, None)]
+    it = bsiter
     while True:
-        value_type = c.bson.iterator_next(subiter)
+        items, is_array, _ = stack[-1]
+        value_type = iterator_next(it)
         if value_type == c.BSON_EOO:
-            break
-        key = coerce_str(c.bson.iterator_key(subiter))
+            _, _, key = stack.pop()
+            value = items if is_array else document_class(items)
+            if not stack:
+                return value
+            it = iterators[len(stack) - 1]
+            if stack[-1][1]:
+                stack[-1][0].append(value)
+            else:
+                stack[-1][0].append((key, value))
+            continue
+        if is_array:
+            key = len(items)
+        else:
+            raw = iterator_key(it)
+            key = key_cache.get(raw)
+            if key is None:
+                key = _decode_key(raw)
+        if value_type in containers:
+            if numeric_arrays and value_type == c.BSON_ARRAY:
+                value = _bson_decode_numeric_array(it, options)
+                if value is not None:
+                    if is_array:
+                        items.append(value)
+                    else:
+                        items.append((key, value))
+                    continue
+            depth = len(stack)
+            if depth == len(iterators):
+                iterators.append(ctypes.byref(c.BSONITERATOR()))
+            iterator_subiterator(it, iterators[depth])
+            it = iterators[depth]
+            stack.append(([], value_type == c.BSON_ARRAY, key))
+            continue
         try:
-            decoder = _TYPE_DECODERS[value_type]
+            decoder = decoders[value_type]
         except KeyError:    # pragma: no cover
             raise BSONDecodeError(
                 'Could not decode object with key {key} of type {type}'.format(
                     key=key, type=_TYPE_NAMES[value_type],
                 )
             )
-        subitems[key] = decoder(subiter)
-    return subitems
+        if is_array:
+            items.append(decoder(it, options))
+        else:
+            items.append((key, decoder(it, options)))
+
+
+# Value sizes of BSON types with fixed-size values. MinKey and MaxKey
+# (0xff and 0x7f) are not in `c` since values of them are never decoded.
+_FIXED_VALUE_SIZES = {
+    c.BSON_DOUBLE: 8, c.BSON_UNDEFINED: 0, c.BSON_OID: 12, c.BSON_BOOL: 1,
+    c.BSON_DATE: 8, c.BSON_NULL: 0, c.BSON_INT: 4, c.BSON_TIMESTAMP: 8,
+    c.BSON_LONG: 8, 0xff: 0, 0x7f: 0,
+}
+
+
+def _find_nul(raw, start, end):
+    for pos in six.moves.range(start, end):
+        if six.indexbytes(raw, pos) == 0:
+            return pos
+    return -1
+
+
+def _is_valid_data(raw, size):
+    """Check that every element in BSON data `raw` lies within its document.
+
+    The C library trusts sizes in the data, so this is needed before handing
+    it data from elsewhere. `raw` can be any indexable buffer, and is read in
+    place. Documents are checked iteratively.
+    """
+    def int32_at(pos):
+        return struct.unpack_from('<i', raw, pos)[0]
+
+    def string_end(pos, end):   # Position after a length-prefixed string.
+        if pos + 4 > end:
+            return None
+        size = int32_at(pos)
+        stop = pos + 4 + size
+        if size < 1 or stop > end or six.indexbytes(raw, stop - 1) != 0:
+            return None
+        return stop
+
+    pending = [(0, size)]
+    while pending:
+        start, end = pending.pop()
+        if (end - start < 5 or int32_at(start) != end - start or
+                six.indexbytes(raw, end - 1) != 0):
+            return False
+        pos = start + 4
+        while True:
+            value_type = six.indexbytes(raw, pos)
+            if value_type == c.BSON_EOO:
+                if pos != end - 1:
+                    return False
+                break
+            key_end = _find_nul(raw, pos + 1, end - 1)
+            if key_end < 0:
+                return False
+            pos = key_end + 1
+            if value_type in _FIXED_VALUE_SIZES:
+                pos += _FIXED_VALUE_SIZES[value_type]
+            elif value_type in (c.BSON_STRING, c.BSON_CODE, c.BSON_SYMBOL):
+                pos = string_end(pos, end)
+            elif value_type == c.BSON_DBREF:
+                pos = string_end(pos, end)
+                if pos is not None:
+                    pos += 12
+            elif value_type in (c.BSON_OBJECT, c.BSON_ARRAY):
+                if pos + 4 > end:
+                    return False
+                stop = pos + int32_at(pos)
+                if stop <= pos or stop > end:
+                    return False
+                pending.append((pos, stop))
+                pos = stop
+            elif value_type == c.BSON_BINDATA:
+                if pos + 5 > end or int32_at(pos) < 0:
+                    return False
+                pos += 5 + int32_at(pos)
+            elif value_type == c.BSON_REGEX:
+                for _ in range(2):  # Pattern and options.
+                    stop = _find_nul(raw, pos, end - 1)
+                    if stop < 0:
+                        return False
+                    pos = stop + 1
+            elif value_type == c.BSON_CODEWSCOPE:
+                if pos + 4 > end:
+                    return False
+                stop = pos + int32_at(pos)
+                if stop <= pos or stop > end:
+                    return False
+                scope = string_end(pos + 4, stop)
+                if scope is None:
+                    return False
+                pending.append((scope, stop))
+                pos = stop
+            else:
+                return False
+            if pos is None or pos >= end:
+                return False
+    return True
 
 
 def _get_data(bs):
@@ -310,10 +1175,15 @@ class BSON(CObjectWrapper):
             object deletion. Defaults to `True`.
         """
         super(BSON, self).__init__(wrapped=wrapped, finalizer=c.bson.del_)
+        self._owner = None
 
     @classmethod
-    def encode(cls, obj, as_query=False):
+    def encode(cls, obj, as_query=False, oid=None, codec=None):
         """Encode a Python object into BSON.
+
+        :param oid: If given, encoded as the `_id` field before content of
+            `obj`. `obj` should not contain an `_id` key in this case.
+        :param codec: A :class:`Codec` to try before the generic encoder.
         """
         if not isinstance(obj, collections.Mapping):
             raise BSONEncodeError(obj)
@@ -322,15 +1192,99 @@ class BSON(CObjectWrapper):
             c.bson.init_as_query(wrapped)
         else:
             c.bson.init(wrapped)
-        for key in obj:
-            _bson_encode_element(key=key, value=obj[key], into=wrapped)
+        if oid is not None:
+            _bson_encode_element(key=ID_KEY_NAME, value=oid, into=wrapped)
+        if codec is None or not codec._encode_contents(obj, wrapped):
+            _bson_encode_items(_iter_mapping_items(obj), into=wrapped)
         c.bson.finish(wrapped)
         return cls(wrapped)
 
-    def decode(self):
+    @classmethod
+    def from_data(cls, data, owner=None):
+        """Wrap BSON data in a buffer that is managed elsewhere.
+
+        The buffer is not copied, and needs to outlive the returned instance.
+
+        :param data: A `bytes` instance, or a `c_void_p` pointing to the data.
+        :param owner: Object keeping the buffer alive, if `data` is a pointer.
+            The returned instance holds a reference to it.
+        """
+        # `data` is already managed, and we don't want the BSON class to manage
+        # it, only the rest of the bson struct. The solution is to pretend the
+        # data is on the stack (i.e. immutable), and `bson_del` would do the
+        # right thing (not freeing things on the stack). Since this is not
+        # really a stack value, we don't care about `mincapacity` (the third
+        # argument), so we pass 0. `maxonstack` (the fourth argument) is the
+        # bson data's length.
+        wrapped = c.bson.create()
+        c.bson.init_on_stack(wrapped, data, 0, c.bson.size2(data))
+        bs = cls(wrapped)
+        bs._owner = data if owner is None else owner
+        return bs
+
+    @classmethod
+    def from_buffer(cls, buf):
+        """Wrap complete BSON data in a buffer, to be saved as-is.
+
+        Unlike :func:`from_data`, the data is validated, and the returned
+        instance is marked as finished. The buffer is not copied if it is
+        `bytes` or writable (including for validation), and is kept alive by
+        the returned instance.
+
+        :param buf: A `bytes` instance, or any object supporting the buffer
+            protocol.
+        :raises BSONDecodeError: If the data is not a complete BSON document,
+            e.g. its size header does not match, or the size of an element in
+            it points past the end of its document.
+        """
+        data, size = _as_c_buffer(buf)
+        if isinstance(data, six.binary_type) or six.PY2:
+            valid = _is_valid_data(data, size)
+        else:   # pragma: no cover
+            # Read a ctypes array as bytes, without copying.
+            view = memoryview(data).cast('B')
+            try:
+                valid = _is_valid_data(view, size)
+            finally:
+                view.release()
+        if not valid:
+            raise BSONDecodeError('Invalid BSON data of {0} bytes.'.format(
+                size,
+            ))
+        wrapped = c.bson.create()
+        c.bson.init_on_stack(wrapped, data, 0, size)
+        head = ctypes.cast(wrapped, ctypes.POINTER(c.BSONHEAD)).contents
+        head.cur = head.data + size
+        head.finished = 1
+        bs = cls(wrapped)
+        bs._owner = data
+        return bs
+
+    @property
+    def data(self):
+        """Raw data of this BSON construct, as bytes.
+        """
+        return _get_data(self)
+
+    def decode(self, codec=None, **options):
+        """Decode this BSON into a Python mapping.
+
+        :param codec: A :class:`Codec` to try before the generic decoder.
+
+        Other keyword arguments are used as fields of :class:`DecodeOptions`.
+        """
+        options = _make_decode_options(options)
+        if options.binary_view:
+            options = options._replace(owner=self)
         bsiter = c.bson.iterator_create()
         c.bson.iterator_init(bsiter, self._wrapped)
-        obj = _bson_decode_object_contents(bsiter)
+        obj = None
+        if codec is not None:
+            obj = codec._decode_contents(bsiter, options)
+            if obj is None:     # Layout mismatch. Start over.
+                c.bson.iterator_init(bsiter, self._wrapped)
+        if obj is None:
+            obj = _bson_decode_contents(bsiter, options)
         c.bson.iterator_dispose(bsiter)
         return obj
 
@@ -348,9 +1302,414 @@ class BSON(CObjectWrapper):
         return not (self == other)
 
 
-def encode(obj, as_query=False):
-    return BSON.encode(obj, as_query)
+def encode(obj, as_query=False, oid=None, codec=None):
+    return BSON.encode(obj, as_query, oid, codec)
+
+
+def decode(bs, codec=None, **options):
+    return bs.decode(codec=codec, **options)
+
+
+def decode_data(data, owner=None, **options):
+    """Decode BSON data in a buffer that is managed elsewhere.
+
+    :param data: A `bytes` instance, or a `c_void_p` pointing to the data.
+    :param owner: Object keeping the buffer alive. See :func:`BSON.from_data`.
+    """
+    return BSON.from_data(data, owner=owner).decode(**options)
+
+
+def iter_file(path):
+    """Iterate through BSON documents concatenated in a file, such as one
+    written by ``mongodump``.
+
+    The file is memory-mapped, and each document is yielded as a `memoryview`
+    slice of the map without copying (as `bytes` on Python 2), which can be
+    passed to :func:`ejdb.Collection.save_raw` directly. The map is private
+    to this iterator; writes to the file while iterating are not seen.
+
+    :raises BSONDecodeError: If the file contains incomplete data. Documents
+        before it are yielded.
+    """
+    with open(path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    buf = mm
+    try:
+        try:
+            buf = memoryview(mm)
+        except TypeError:   # pragma: no cover. Python 2.
+            pass
+        offset = 0
+        end = len(mm)
+        while offset < end:
+            size = None
+            if end - offset >= 4:
+                size = struct.unpack_from('<i', mm, offset)[0]
+            if size is None or size < 5 or offset + size > end:
+                raise BSONDecodeError(
+                    'Incomplete BSON data in {0} at offset {1}.'.format(
+                        path, offset,
+                    )
+                )
+            yield buf[offset:offset + size]
+            offset += size
+    finally:
+        if buf is not mm:
+            buf.release()
+        try:
+            mm.close()
+        except BufferError:     # Slices still in use. Closed when collected.
+            pass
+
+
+def write_file(path, docs):
+    """Write documents into a file as concatenated BSON, the format read by
+    :func:`iter_file` and ``mongorestore``.
+
+    :param docs: Iterable of mappings to encode, :class:`BSON` instances, or
+        BSON data as `bytes` or other buffer objects, e.g. from
+        :func:`ejdb.Collection.find_raw`. Data are written without validation.
+    :returns: Count of documents written.
+    """
+    count = 0
+    with open(path, 'wb') as f:
+        for doc in docs:
+            if isinstance(doc, collections.Mapping):
+                doc = BSON.encode(doc)
+            if isinstance(doc, BSON):
+                doc = _get_data(doc)
+            f.write(doc)
+            count += 1
+    return count
+
+
+Column = collections.namedtuple('Column', ['values', 'mask'])
+"""Values of a field across documents, from :func:`decode_columns`.
+
+:param values: Value of the field in each document, `None` if missing.
+:param mask: Whether the field is missing (or null) in each document.
+"""
+
+
+def decode_columns(datas, fields, **options):
+    """Decode top-level `fields` of BSON documents into columns.
+
+    Only the given fields are decoded; other fields are skipped without being
+    converted to Python objects, and no document is built.
+
+    :param datas: Iterable of BSON data, as `bytes` instances or `c_void_p`
+        pointing to the data.
+    :param fields: Names of top-level fields to decode.
+    :returns: An ordered mapping of field names to :class:`Column` instances.
+
+    Other keyword arguments are used as fields of :class:`DecodeOptions`.
+    They apply to values of the fields.
+    """
+    options = _make_decode_options(options)
+    fields = [coerce_str(f) for f in fields]
+    wanted = {coerce_char_p(f): i for i, f in enumerate(fields)}
+    count = len(fields)
+    columns = [[] for _ in fields]
+    masks = [[] for _ in fields]
+
+    iterator_next = c.bson.iterator_next
+    iterator_key = c.bson.iterator_key
+    decoders = _TYPE_DECODERS
+    it = ctypes.byref(c.BSONITERATOR())
+    for data in datas:
+        row = [None] * count
+        found = 0
+        c.bson.iterator_from_buffer(it, data)
+        while found < count:
+            value_type = iterator_next(it)
+            if value_type == c.BSON_EOO:
+                break
+            index = wanted.get(iterator_key(it))
+            if index is None:
+                continue
+            found += 1
+            try:
+                decoder = decoders[value_type]
+            except KeyError:    # pragma: no cover
+                raise BSONDecodeError(
+                    'Could not decode column {key} of type {type}'.format(
+                        key=fields[index], type=_TYPE_NAMES[value_type],
+                    )
+                )
+            row[index] = decoder(it, options)
+        for column, mask, value in zip(columns, masks, row):
+            column.append(value)
+            mask.append(value is None)
+    return collections.OrderedDict(
+        (name, Column(column, mask))
+        for name, column, mask in zip(fields, columns, masks)
+    )
+
+
+def column_to_numpy(column):
+    """Convert a :class:`Column` of lists into one of NumPy arrays.
+
+    Values are typed if all non-missing values are booleans, integers,
+    numbers, or datetimes; missing values are filled with zero (or NaT) in
+    these cases, and should be looked up in the mask. Other columns have the
+    `object` dtype.
+    """
+    import numpy
+
+    present = [v for v in column.values if v is not None]
+    types = set(type(v) for v in present)
+    if not types:
+        dtype, fill = object, None
+    elif types == {bool}:
+        dtype, fill = numpy.bool_, False
+    elif all(issubclass(t, six.integer_types) and t is not bool
+             for t in types):
+        dtype, fill = numpy.int64, 0
+    elif all(issubclass(t, (float, six.integer_types)) and t is not bool
+             for t in types):
+        dtype, fill = numpy.float64, 0.0
+    elif types == {datetime.datetime}:
+        dtype, fill = 'datetime64[ms]', None
+    else:
+        dtype, fill = object, None
+    if fill is None:
+        values = numpy.array(column.values, dtype=dtype)
+    else:
+        values = numpy.array(
+            [fill if v is None else v for v in column.values], dtype=dtype,
+        )
+    return Column(values, numpy.array(column.mask, dtype=numpy.bool_))
+
+
+# Field types :func:`compile_codec` generates specialized code for. Each maps
+# to a 4-tuple:
+#
+# * A condition (on `{v}`) the value must satisfy to use the fast path.
+# * Lines to append value `{v}` under key `{k}` into `into`, OR-ing the
+#   result into `r`. C functions in `_CODEC_C_FUNCTIONS` are available with
+#   a leading underscore.
+# * BSON types the decoder accepts for this field.
+# * Expression to decode each type above from iterator `it`.
+_CODEC_FIELD_TYPES = {
+    six.text_type: (
+        'type({v}) is _text',
+        ['b = {v}.encode("utf-8")',
+         'r |= _append_string_n(into, {k}, b, len(b))'],
+        [c.BSON_STRING],
+        ['_string_at(_iterator_string(it), '
+         '_iterator_string_len(it) - 1).decode("utf-8")'],
+    ),
+    int: (
+        'type({v}) in _ints and -_LONG_MAX - 1 <= {v} <= _LONG_MAX',
+        ['if -_INT_MAX - 1 <= {v} <= _INT_MAX:',
+         '    r |= _append_int(into, {k}, {v})',
+         'else:',
+         '    r |= _append_long(into, {k}, {v})'],
+        [c.BSON_INT, c.BSON_LONG],
+        ['_iterator_int_raw(it)', '_iterator_long_raw(it)'],
+    ),
+    float: (
+        'type({v}) is float',
+        ['r |= _append_double(into, {k}, {v})'],
+        [c.BSON_DOUBLE],
+        ['_iterator_double_raw(it)'],
+    ),
+    bool: (
+        'type({v}) is bool',
+        ['r |= _append_bool(into, {k}, {v})'],
+        [c.BSON_BOOL],
+        ['_iterator_bool_raw(it)'],
+    ),
+    datetime.datetime: (
+        'type({v}) is _datetime',
+        ['r |= _append_date(into, {k}, _datetime_to_millis({v}))'],
+        [c.BSON_DATE],
+        ['_bson_decode_date(it, options)'],
+    ),
+    ObjectId: (
+        'type({v}) is _ObjectId',
+        ['r |= _append_oid(into, {k}, _byref({v}.to_bsonoid()))'],
+        [c.BSON_OID],
+        ['_bson_decode_oid(it, options)'],
+    ),
+}
+if six.PY2:     # pragma: no cover
+    _CODEC_FIELD_TYPES[long] = _CODEC_FIELD_TYPES[int]  # noqa
+
+
+_CODEC_C_FUNCTIONS = [
+    'append_string_n', 'append_int', 'append_long', 'append_double',
+    'append_bool', 'append_date', 'append_oid',
+    'iterator_next', 'iterator_key', 'iterator_string', 'iterator_string_len',
+    'iterator_int_raw', 'iterator_long_raw', 'iterator_double_raw',
+    'iterator_bool_raw',
+]
+
+
+class Codec(object):
+    """Encoder and decoder specialized for documents of a fixed layout.
 
+    Create instances with :func:`compile_codec`, and pass them to
+    :func:`encode` and :func:`decode` (or :func:`Collection.register_schema`).
+    A document not matching the layout is handled by the generic encoder or
+    decoder instead.
+
+    :ivar schema: List of (name, type) pairs this codec is compiled for.
+    :ivar source: Generated Python source code, for debugging.
+    """
+    def __init__(self, schema, source, namespace):
+        super(Codec, self).__init__()
+        self.schema = schema
+        self.source = source
+        self._encode_contents = namespace['_encode']
+        self._decode_contents = namespace['_decode']
+
+    def __repr__(self):
+        return '<Codec {fields}>'.format(
+            fields=', '.join(name for name, _ in self.schema),
+        )
+
+    def encode(self, obj, as_query=False, oid=None):
+        return BSON.encode(obj, as_query=as_query, oid=oid, codec=self)
+
+    def decode(self, bs, **options):
+        return bs.decode(codec=self, **options)
+
+    def decode_data(self, data, owner=None, **options):
+        return BSON.from_data(data, owner=owner).decode(codec=self, **options)
+
+
+def _generate_codec_source(schema):
+    encode = [
+        'def _encode(obj, into):',
+        '    n = len(obj)',
+        '    oid = obj.get(_ID)',
+        '    if oid is not None:',
+        '        n -= 1',
+        '    if n != {count}:'.format(count=len(schema)),
+        '        return False',
+        '    try:',
+    ]
+    encode.extend(
+        '        v{i} = obj[_K{i}]'.format(i=i) for i in range(len(schema))
+    )
+    encode.extend(['    except KeyError:', '        return False'])
+    conditions = []
+    appends = []
+    for i, (_, type_) in enumerate(schema):
+        v, k = 'v{i}'.format(i=i), '_KB{i}'.format(i=i)
+        try:
+            condition, lines, _, _ = _CODEC_FIELD_TYPES[type_]
+        except KeyError:
+            appends.append('_encode_element({k}, {v}, into)'.format(k=k, v=v))
+            continue
+        conditions.append(condition.format(v=v))
+        appends.extend(line.format(v=v, k=k) for line in lines)
+    if conditions:
+        encode.append('    if not ({conds}):'.format(
+            conds=' and\n            '.join(conditions),
+        ))
+        encode.append('        return False')
+    encode.extend([
+        '    if oid is not None:',
+        '        _encode_element(_ID, oid, into)',
+        '    r = 0',
+    ])
+    encode.extend('    ' + line for line in appends)
+    encode.extend([
+        '    if r != 0:',
+        '        raise BSONEncodeError(obj)',
+        '    return True',
+    ])
+
+    decode = [
+        'def _decode(it, options):',
+        '    doc = []',
+        '    t = _iterator_next(it)',
+        '    if t == _OID and _iterator_key(it) == _IDB:',
+        '        doc.append((_ID, _bson_decode_oid(it, options)))',
+        '        t = _iterator_next(it)',
+    ]
+    for i, (_, type_) in enumerate(schema):
+        # The key of EOO is past the end of the data. Don't read it.
+        decode.extend(['    if t == _EOO:', '        return None'])
+        decode.append('    if _iterator_key(it) != _KB{i}:'.format(i=i))
+        decode.append('        return None')
+        try:
+            _, _, bson_types, exprs = _CODEC_FIELD_TYPES[type_]
+        except KeyError:
+            decode.extend([
+                '    decoder = _decoders.get(t)',
+                '    if decoder is None:',
+                '        return None',
+                '    doc.append((_K{i}, decoder(it, options)))'.format(i=i),
+            ])
+        else:
+            verb = 'if'
+            for bson_type, expr in zip(bson_types, exprs):
+                decode.append('    {verb} t == {bt}:'.format(
+                    verb=verb, bt=bson_type,
+                ))
+                decode.append('        doc.append((_K{i}, {expr}))'.format(
+                    i=i, expr=expr,
+                ))
+                verb = 'elif'
+            decode.extend(['    else:', '        return None'])
+        decode.append('    t = _iterator_next(it)')
+    decode.extend([
+        '    if t != _EOO:',
+        '        return None',
+        '    return options.document_class(doc)',
+    ])
+    return '\n'.join(encode + [''] + decode) + '\n'
+
+
+def compile_codec(schema):
+    """Generate a :class:`Codec` specialized for a fixed document layout.
+
+    :param schema: An ordered mapping, or a sequence of pairs, specifying the
+        name and Python type of each field. Types with specialized code are
+        `str`, `int`, `float`, `bool`, `datetime.datetime`, and
+        :class:`ObjectId`. Fields of other types are handled by the generic
+        encoder and decoder. An `_id` field is always allowed, and needs not
+        be declared.
+
+    The generated encoder writes fields in the schema's order, after `_id`.
+    The decoder falls back to the generic one if the data does not contain
+    exactly the declared fields in order, each of an expected BSON type.
+    """
+    if not c.initialized:
+        c.init()
+    if isinstance(schema, collections.Mapping):
+        schema = list(schema.items())
+    schema = [(coerce_str(name), type_) for name, type_ in schema]
+    if len(set(name for name, _ in schema)) != len(schema):
+        raise ValueError('Duplicate field names in schema.')
 
-def decode(bs):
-    return bs.decode()
+    # Bind C functions as globals of the generated code, to save attribute
+    # lookups on `c.bson`.
+    namespace = {
+        '_' + name: getattr(c.bson, name) for name in _CODEC_C_FUNCTIONS
+    }
+    namespace.update({
+        '_byref': ctypes.byref, '_string_at': ctypes.string_at,
+        '_text': six.text_type, '_ints': six.integer_types,
+        '_datetime': datetime.datetime, '_ObjectId': ObjectId,
+        '_INT_MAX': INT_MAX, '_LONG_MAX': LONG_MAX,
+        '_OID': c.BSON_OID, '_EOO': c.BSON_EOO,
+        '_ID': c.JDBIDKEYNAME, '_IDB': ID_KEY_NAME,
+        '_decoders': _TYPE_DECODERS,
+        '_encode_element': _bson_encode_element,
+        '_datetime_to_millis': _datetime_to_millis,
+        '_bson_decode_date': _bson_decode_date,
+        '_bson_decode_oid': _bson_decode_oid,
+        'BSONEncodeError': BSONEncodeError,
+    })
+    for i, (name, _) in enumerate(schema):
+        namespace['_K{i}'.format(i=i)] = name
+        namespace['_KB{i}'.format(i=i)] = coerce_char_p(name)
+    source = _generate_codec_source(schema)
+    six.exec_(compile(source, '<ejdb codec>', 'exec'), namespace)
+    return Codec(schema, source, namespace)
@@ -5,6 +5,7 @@
 """
 
 from __future__ import absolute_import
+import binascii
 import ctypes
 import ctypes.util
 import os
@@ -29,7 +30,7 @@ JBOCREAT = 1 << 2
 JBOTRUNC = 1 << 3
 JBONOLCK = 1 << 4
 JBOLCKNB = 1 << 5
-JBOTSYNC = 1 << 5
+JBOTSYNC = 1 << 6
 
 
 # enum { /** Index modes, index types. */
@@ -60,6 +61,20 @@ JBQRYCOUNT = 1
 JBQRYFINDONE = 1 << 1
 
 
+# enum { /** Database export/import modes */
+#     JBJSONEXPORT = 1, /**< Export data as JSON files instead exporting into
+#                            BSONs */
+#     JBIMPORTUPDATE = 1 << 1, /**< Update existing collection entries with
+#                                   imported ones. */
+#     JBIMPORTREPLACE = 1 << 2 /**< Recreate existing collections and replace
+#                                   all collection data with imported
+#                                   entries. */
+# };
+JBJSONEXPORT = 1
+JBIMPORTUPDATE = 1 << 1
+JBIMPORTREPLACE = 1 << 2
+
+
 # #define BSON_OK 0
 # #define BSON_ERROR -1
 BSON_OK = 0
@@ -179,6 +194,53 @@ class EJCOLLOPTS(ctypes.Structure):
 EJCOLLOPTSREF = ctypes.POINTER(EJCOLLOPTS)
 
 
+# typedef struct {
+#     char *data;
+#     char *cur;
+#     int dataSize;
+#     bson_bool_t finished;
+#     ...
+# } bson;
+# TODO: This is private API. Only the leading fields are declared, to mark a
+# bson wrapping existing data as finished.
+class BSONHEAD(ctypes.Structure):
+    _fields_ = [
+        ('data', ctypes.c_void_p),
+        ('cur', ctypes.c_void_p),
+        ('dataSize', ctypes.c_int),
+        ('finished', ctypes.c_int),
+    ]
+
+
+# typedef struct {
+#     const char *cur;
+#     bson_bool_t first;
+# } bson_iterator;
+# Allocated in Python (and passed with `byref`) to iterate into sub-objects
+# without a `bson_iterator_create` call per level.
+class BSONITERATOR(ctypes.Structure):
+    _fields_ = [
+        ('cur', ctypes.c_void_p),
+        ('first', ctypes.c_int),
+    ]
+
+
+def parse_oid_string(s):
+    """Parse a 24-character-long hex string into the 12 bytes of an OID.
+
+    This is done in Python. It is equivalent to `ejdbisvalidoidstr` plus
+    `bson_oid_from_string`, but without two round trips into C.
+    """
+    s = coerce_char_p(s)
+    try:
+        data = binascii.unhexlify(s) if len(s) == 24 else b''
+    except (TypeError, ValueError):
+        data = b''
+    if len(data) != 12:
+        raise ValueError('OID should be a 24-character-long hex string.')
+    return data
+
+
 # #pragma pack(1)
 # typedef union {
 #     char bytes[12];
@@ -195,19 +257,20 @@ class BSONOID(ctypes.Union):
     ]
 
     def __str__(self):
-        buf = ctypes.create_string_buffer(25)
-        bson.oid_to_string(ctypes.byref(self), buf)
-        s = buf.value.decode('ascii')   # ASCII is enough since OID is hex.
+        # Equivalent to `bson_oid_to_string`, without calling into C.
+        s = binascii.hexlify(self.binary).decode('ascii')
         return s
 
+    @property
+    def binary(self):
+        """The 12 bytes of this OID.
+        """
+        # Don't use `self.bytes`; ctypes truncates char arrays at NULL.
+        return ctypes.string_at(ctypes.addressof(self), 12)
+
     @classmethod
     def from_string(cls, s):
-        s = coerce_char_p(s)
-        if not ejdb.isvalidoidstr(s):
-            raise ValueError('OID should be a 24-character-long hex string.')
-        oid = cls()
-        bson.oid_from_string(ctypes.byref(oid), s)
-        return oid
+        return cls.from_buffer_copy(parse_oid_string(s))
 
 
 BSONOIDREF = ctypes.POINTER(BSONOID)
@@ -315,6 +378,18 @@ def init(ejdb_path=None):
     ejdb.setindex.argtypes = [EJCOLLREF, ctypes.c_char_p, ctypes.c_int]
     ejdb.setindex.restype = ctypes.c_bool
 
+    ejdb.export = _.ejdbexport
+    ejdb.export.argtypes = [
+        EJDBREF, ctypes.c_char_p, TCLISTREF, ctypes.c_int, TCXSTRREF,
+    ]
+    ejdb.export.restype = ctypes.c_bool
+
+    ejdb.import_ = _.ejdbimport
+    ejdb.import_.argtypes = [
+        EJDBREF, ctypes.c_char_p, TCLISTREF, ctypes.c_int, TCXSTRREF,
+    ]
+    ejdb.import_.restype = ctypes.c_bool
+
     ejdb.meta = _.ejdbmeta
     ejdb.meta.argtypes = [EJDBREF]
     ejdb.meta.restype = BSONREF
@@ -363,6 +438,47 @@ def init(ejdb_path=None):
     ejdb.syncdb.argtypes = [EJDBREF]
     ejdb.syncdb.restype = ctypes.c_bool
 
+    tc.tdbrnum = _.tctdbrnum
+    tc.tdbrnum.argtypes = [ctypes.c_void_p]
+    tc.tdbrnum.restype = ctypes.c_uint64
+
+    tc.tdbiterinit = _.tctdbiterinit
+    tc.tdbiterinit.argtypes = [ctypes.c_void_p]
+    tc.tdbiterinit.restype = ctypes.c_bool
+
+    # Returns a region allocated with malloc, to be freed with tcfree.
+    tc.tdbiternext = _.tctdbiternext
+    tc.tdbiternext.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_int)]
+    tc.tdbiternext.restype = ctypes.c_void_p
+
+    tc.free = _.tcfree
+    tc.free.argtypes = [ctypes.c_void_p]
+    tc.free.restype = None
+
+    tc.listnew = _.tclistnew
+    tc.listnew.argtypes = []
+    tc.listnew.restype = TCLISTREF
+
+    tc.listpush2 = _.tclistpush2
+    tc.listpush2.argtypes = [TCLISTREF, ctypes.c_char_p]
+    tc.listpush2.restype = None
+
+    tc.xstrnew = _.tcxstrnew
+    tc.xstrnew.argtypes = []
+    tc.xstrnew.restype = TCXSTRREF
+
+    tc.xstrdel = _.tcxstrdel
+    tc.xstrdel.argtypes = [TCXSTRREF]
+    tc.xstrdel.restype = None
+
+    tc.xstrptr = _.tcxstrptr
+    tc.xstrptr.argtypes = [TCXSTRREF]
+    tc.xstrptr.restype = ctypes.c_void_p
+
+    tc.xstrsize = _.tcxstrsize
+    tc.xstrsize.argtypes = [TCXSTRREF]
+    tc.xstrsize.restype = ctypes.c_int
+
     tc.listdel = _.tclistdel
     tc.listdel.argtypes = [TCLISTREF]
     tc.listdel.restype = None
@@ -433,7 +549,7 @@ def init(ejdb_path=None):
     # but it really is an enum value, so we use c_int instead.
     bson.append_binary = _.bson_append_binary
     bson.append_binary.argtypes = [
-        BSONREF, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_int,
+        BSONREF, ctypes.c_char_p, ctypes.c_int, ctypes.c_void_p, ctypes.c_int,
     ]
     bson.append_binary.restype = ctypes.c_int
 
@@ -570,6 +686,21 @@ def init(ejdb_path=None):
     bson.iterator_subiterator.argtypes = [BSONITERREF, BSONITERREF]
     bson.iterator_subiterator.restype = None
 
+    # Return type is const char *, but we want the address, not a copy.
+    bson.iterator_value = _.bson_iterator_value
+    bson.iterator_value.argtypes = [BSONITERREF]
+    bson.iterator_value.restype = ctypes.c_void_p
+
+    bson.iterator_from_buffer = _.bson_iterator_from_buffer
+    bson.iterator_from_buffer.argtypes = [BSONITERREF, ctypes.c_void_p]
+    bson.iterator_from_buffer.restype = None
+
+    bson.append_field_from_iterator2 = _.bson_append_field_from_iterator2
+    bson.append_field_from_iterator2.argtypes = [
+        ctypes.c_char_p, BSONITERREF, BSONREF,
+    ]
+    bson.append_field_from_iterator2.restype = ctypes.c_int
+
     # For debugging.
     bson.print_raw = _.bson_print_raw
     bson.print_raw.argtypes = [ctypes.c_char_p, ctypes.c_int]
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Caches used by collections to skip round trips into the C library.
+"""
+
+from __future__ import absolute_import
+import collections
+import threading
+import time
+
+
+# Python 2 does not have a monotonic clock in the standard library.
+_clock = getattr(time, 'monotonic', time.time)
+
+
+CacheInfo = collections.namedtuple('CacheInfo', [
+    'hits', 'misses', 'maxsize', 'maxbytes', 'currsize', 'currbytes',
+])
+
+
+class LRUCache(object):
+    """A thread-safe mapping with least-recently-used eviction.
+
+    :param maxsize: Maximum number of entries kept. `None` means unbounded.
+    :param maxbytes: Maximum total size of entries kept, as reported by the
+        `size` argument of :func:`put`. `None` means unbounded.
+    :param ttl: Seconds an entry stays valid after it is put. `None` means
+        entries never expire.
+    """
+    def __init__(self, maxsize=1024, maxbytes=None, ttl=None):
+        super(LRUCache, self).__init__()
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """Look up `key`, counting a hit or a miss.
+        """
+        with self._lock:
+            try:
+                value, size, expires = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires <= _clock():
+                self._bytes -= size
+                self.misses += 1
+                return default
+            self._entries[key] = (value, size, expires)   # Mark as recent.
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size=0):
+        """Store `value` under `key`, evicting old entries if needed.
+
+        An entry larger than `maxbytes` is not stored at all.
+        """
+        if self.maxbytes is not None and size > self.maxbytes:
+            self.discard(key)
+            return
+        expires = None if self.ttl is None else _clock() + self.ttl
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size, expires)
+            self._bytes += size
+            self._evict()
+
+    def discard(self, key):
+        """Remove `key` if it is cached.
+        """
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+    def clear(self):
+        """Remove all entries. Hit and miss counts are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def info(self):
+        """Report cache statistics as a :class:`CacheInfo`.
+        """
+        with self._lock:
+            return CacheInfo(
+                hits=self.hits, misses=self.misses,
+                maxsize=self.maxsize, maxbytes=self.maxbytes,
+                currsize=len(self._entries), currbytes=self._bytes,
+            )
+
+    def _evict(self):
+        entries = self._entries
+        while entries and (
+                (self.maxsize is not None and len(entries) > self.maxsize) or
+                (self.maxbytes is not None and self._bytes > self.maxbytes)):
+            _, (_, size, _) = entries.popitem(last=False)
+            self._bytes -= size
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Conversion between documents and JSON, following MongoDB Extended JSON
+conventions for values JSON cannot represent.
+
+* :class:`bson.ObjectId` is written as ``{"$oid": "<hex>"}``.
+* `datetime.datetime` is written as ``{"$date": <milliseconds>}``.
+* `uuid.UUID` is written as ``{"$uuid": "<canonical form>"}``.
+* Binary data is written as
+  ``{"$binary": {"base64": "<data>", "subType": "<hex>"}}``.
+
+Reading also accepts the canonical ``$date`` and ``$numberLong`` forms, ISO
+8601 dates, UUIDs in ``$binary`` form, and the legacy ``$binary``/``$type``
+form.
+"""
+
+from __future__ import absolute_import, unicode_literals
+import array
+import base64
+import binascii
+import datetime
+import json
+import uuid
+
+import six
+
+from . import bson
+
+
+_EPOCH = datetime.datetime.utcfromtimestamp(0)
+
+
+def _binary(data, subtype):
+    return {'$binary': {
+        'base64': base64.b64encode(memoryview(data).tobytes()).decode(
+            'ascii',
+        ),
+        'subType': '{0:02x}'.format(subtype),
+    }}
+
+
+def default(value):
+    """Convert `value` not natively supported by JSON.
+
+    This is suitable as the `default` argument of :func:`json.dumps`.
+    """
+    if isinstance(value, bson.ObjectId):
+        return {'$oid': str(value)}
+    if isinstance(value, datetime.datetime):
+        return {'$date': bson._datetime_to_millis(value)}
+    if isinstance(value, datetime.date):
+        value = datetime.datetime.combine(value, datetime.datetime.min.time())
+        return {'$date': bson._datetime_to_millis(value)}
+    if isinstance(value, uuid.UUID):
+        return {'$uuid': str(value)}
+    if isinstance(value, bson.MD5):
+        return _binary(value, bson.c.BSON_BIN_MD5)
+    if isinstance(value, (six.binary_type, bytearray, memoryview)):
+        return _binary(value, bson.c.BSON_BIN_BINARY)
+    if isinstance(value, array.array) or hasattr(value, 'tolist'):
+        return value.tolist()   # Numeric arrays, including NumPy's.
+    if isinstance(value, bson.Record):
+        return value._asdict()
+    raise TypeError('{0!r} is not JSON serializable.'.format(value))
+
+
+def _parse_date(value):
+    if isinstance(value, dict):
+        value = int(value['$numberLong'])
+    if isinstance(value, six.integer_types + (float,)):
+        return _EPOCH + datetime.timedelta(milliseconds=value)
+    value = value.rstrip('Z')
+    if value.endswith('+00:00'):
+        value = value[:-6]
+    for fmt in ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError('Could not parse date {0!r}.'.format(value))
+
+
+def _parse_binary(obj):
+    spec = obj['$binary']
+    if isinstance(spec, dict):
+        data, subtype = spec['base64'], spec['subType']
+    else:
+        data, subtype = spec, obj['$type']
+    data = base64.b64decode(data)
+    subtype = int(subtype, 16)
+    if subtype in (bson.c.BSON_BIN_UUID, 4):
+        return uuid.UUID(bytes=data)
+    try:
+        decode = bson._BIN_SUBTYPE_DECODERS[subtype]
+    except KeyError:
+        return data
+    return decode(data)
+
+
+def object_hook(obj):
+    """Convert Extended JSON values back into Python values.
+
+    This is suitable as the `object_hook` argument of :func:`json.loads`.
+    """
+    if len(obj) == 1:
+        key, value = next(iter(obj.items()))
+        if key == '$oid':
+            return bson.ObjectId(value)
+        if key == '$date':
+            return _parse_date(value)
+        if key == '$uuid':
+            return uuid.UUID(value)
+        if key == '$numberLong':
+            return int(value)
+        if key == '$binary':
+            return _parse_binary(obj)
+    elif len(obj) == 2 and '$binary' in obj and '$type' in obj:
+        return _parse_binary(obj)
+    return obj
+
+
+def dumps(document, **kwargs):
+    """Serialize `document` into a JSON string.
+    """
+    kwargs.setdefault('default', default)
+    kwargs.setdefault('separators', (',', ':'))
+    return json.dumps(document, **kwargs)
+
+
+def loads(s, **kwargs):
+    """Deserialize a JSON string into a document.
+    """
+    kwargs.setdefault('object_hook', object_hook)
+    try:
+        return json.loads(s, **kwargs)
+    except (TypeError, KeyError, binascii.Error) as e:
+        raise ValueError('Invalid Extended JSON: {0}'.format(e))
@@ -31,14 +31,14 @@ class ListIterator(CObjectWrapper):
         elif isinstance(key, numbers.Number):
             if key >= len(self):
                 raise IndexError('Iterator index out of range.')
-            value_p = c.tc.listval2(self._wrapped, key)
+            value_p = self._get_value_p(key)
             return self.instantiate(value_p)
         return NotImplemented
 
     def __next__(self):
         if self._i >= self._len:
             raise StopIteration
-        value_p = c.tc.listval2(self._wrapped, self._i)
+        value_p = self._get_value_p(self._i)
         self._i += 1
         return self.instantiate(value_p)
 
@@ -47,6 +47,9 @@ class ListIterator(CObjectWrapper):
         """
         return self.__next__()
 
+    def _get_value_p(self, index):
+        return c.tc.listval2(self._wrapped, index)
+
     def instantiate(self, value_p):
         """Subclasses should override this method to instantiate an item during
         iteration.
@@ -3,6 +3,7 @@
 
 import collections
 import os
+import threading
 import weakref
 
 import six
@@ -93,6 +94,31 @@ class PrettyOrderedDict(collections.OrderedDict):
         return dict.__repr__(self)
 
 
+class PeriodicTimer(threading.Thread):
+    """Daemon thread calling `function` every `interval` seconds.
+
+    The first call happens `interval` seconds after :func:`start`. Call
+    :func:`stop` to end the loop; the thread exits after the current call (if
+    any) finishes. The loop also ends if `function` returns `False`.
+    """
+    def __init__(self, interval, function):
+        super(PeriodicTimer, self).__init__()
+        self.daemon = True
+        self.interval = interval
+        self.function = function
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            if self.function() is False:
+                break
+
+    def stop(self):
+        self._stopped.set()
+        if self.is_alive() and self is not threading.current_thread():
+            self.join()
+
+
 def get_package_root():
     cur = os.path.abspath(__file__)
     while True:
@@ -35,6 +35,16 @@ extras_requirements = {
         'ptpython',
         'pystandardpaths',
     ],
+    'numpy': [
+        'numpy',
+    ],
+    'pandas': [
+        'numpy',
+        'pandas',
+    ],
+    'parquet': [
+        'pyarrow',
+    ],
 }
 
 test_requirements = [
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Compare generic and codec encoding and decoding of a fixed-shape record.
+
+Run with ``python tests/bench_codec.py [count]``. Requires libejdb.
+"""
+
+from __future__ import print_function, unicode_literals
+import collections
+import datetime
+import sys
+import timeit
+
+import six
+
+from ejdb import bson, c
+
+
+SCHEMA = [
+    ('name', six.text_type),
+    ('age', int),
+    ('score', float),
+    ('male', bool),
+    ('born', datetime.datetime),
+    ('likes', list),
+]
+
+RECORD = collections.OrderedDict([
+    ('name', 'Grenny'),
+    ('age', 1),
+    ('score', 9.5),
+    ('male', True),
+    ('born', datetime.datetime(2015, 8, 19)),
+    ('likes', ['green color', 'night']),
+])
+
+
+def main(count):
+    c.init()
+    codec = bson.compile_codec(SCHEMA)
+    bs = bson.encode(RECORD)
+    assert bs == bson.encode(RECORD, codec=codec)
+    assert bs.decode(codec=codec) == bs.decode()
+
+    cases = [
+        ('encode', lambda: bson.encode(RECORD),
+         lambda: bson.encode(RECORD, codec=codec)),
+        ('decode', lambda: bs.decode(), lambda: bs.decode(codec=codec)),
+    ]
+    for name, generic, specialized in cases:
+        generic_time = min(timeit.repeat(generic, number=count, repeat=3))
+        codec_time = min(timeit.repeat(specialized, number=count, repeat=3))
+        print('{name}: generic {g:.3f}s, codec {s:.3f}s, {x:.2f}x'.format(
+            name=name, g=generic_time, s=codec_time,
+            x=generic_time / codec_time,
+        ))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
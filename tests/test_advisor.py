@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from ejdb import advisor, api
+
+
+def test_get_predicates():
+    predicates = advisor.get_predicates({
+        '_id': 'msyok', 'name': 'msyok', 'age': {'$gt': 20, '$exists': True},
+        '$or': [{'nick': {'$icase': 'MSYOK'}}, {'tags': {'$stror': ['a']}}],
+        'gone': {'$ne': 1}, 'flag': True, '$set': {'updated': 1},
+    })
+    assert predicates == (
+        ('age', api.NUMBER), ('name', api.STRING),
+        ('nick', api.ISTRING), ('tags', api.ARRAY),
+    )
+
+
+def test_get_sort_keys():
+    assert advisor.get_sort_keys({}) == ()
+    assert advisor.get_sort_keys({'$orderby': {'age': -1}}) == ('age',)
+
+
+class TestAdvisor(object):
+
+    def setup(self):
+        self.dirpath = tempfile.mkdtemp()
+        path = os.path.join(self.dirpath, 'msyok')
+        self.jb = api.Database(
+            path=path, options=(api.WRITE | api.TRUNCATE | api.CREATE),
+        )
+        self.coll = self.jb.create_collection('msyok')
+        self.coll.insert_many([
+            {'name': 'msyok{0}'.format(i), 'age': i} for i in range(100)
+        ])
+
+    def teardown(self):
+        if self.jb.is_open():
+            self.jb.close()
+        shutil.rmtree(self.dirpath)
+
+    def test_recommend(self):
+        with advisor.Advisor(self.jb) as adv:
+            for i in range(10):
+                self.coll.find({'name': 'msyok{0}'.format(i)})
+                self.coll.find({}, hints={'$orderby': {'age': 1}})
+            self.coll.find({'missing': {'$gt': 50}})
+        assert self.jb._query_recorder is None
+        queries = adv.queries()
+        assert sum(q.count for q in queries) == 21
+        assert queries[0].collection == 'msyok'
+
+        recommendations = adv.recommend(min_queries=10)
+        assert sorted((r.path, r.type, r.reason) for r in recommendations) == [
+            ('age', api.NUMBER, 'sort'), ('name', api.STRING, 'filter'),
+        ]
+        assert all(r.queries == 10 for r in recommendations)
+        name = [r for r in recommendations if r.path == 'name'][0]
+        assert 0 <= name.benefit <= name.seconds
+
+        adv.apply(recommendations)
+        assert sorted((i.path, i.type) for i in self.coll.indexes()) == [
+            ('age', api.NUMBER), ('name', api.STRING),
+        ]
+        assert adv.recommend(min_queries=10) == []
+
+    def test_explain(self):
+        self.coll.create_string_index('name')
+        with advisor.Advisor(self.jb, explain=True) as adv:
+            self.coll.find({'name': 'msyok1'})
+            self.coll.find({'age': 1})
+        queries = {q.predicates[0][0]: q for q in adv.queries()}
+        assert queries['name'].explained == 1
+        assert queries['name'].full_scans == 0
+        assert queries['age'].full_scans == 1
+        assert [r.path for r in adv.recommend(min_queries=1)] == ['age']
+
+    def test_single_recorder(self):
+        adv = advisor.Advisor(self.jb)
+        adv.start()
+        with pytest.raises(ValueError):
+            advisor.Advisor(self.jb).start()
+        adv.stop()
+        adv.clear()
+        assert adv.queries() == []
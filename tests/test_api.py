@@ -7,6 +7,8 @@ import re
 import shutil
 import tempfile
 
+from datetime import datetime, time
+
 from ctypes import byref
 
 import pytest
@@ -92,6 +94,16 @@ class TestDatabaseInvalid(object):
         jb = api.Database(path='', options=api.WRITE)
         assert jb.writable
 
+    def test_durability_invalid(self):
+        with pytest.raises(ValueError):
+            api.Database(path='', durability='sometimes')
+
+    def test_sync_closed(self):
+        jb = api.Database(path='')
+        with pytest.raises(api.DatabaseError) as ctx:
+            jb.sync()
+        assert str(ctx.value) == 'Database not opened.'
+
 
 class TestDatabaseInit(object):
 
@@ -257,6 +269,112 @@ class TestDatabase(object):
         coll = self.jb.create_collection('msyok')
         assert self.jb.collection_names == {coll.name}
 
+    def test_sync(self):
+        self.jb.create_collection('msyok').save({'name': 'Mosky'})
+        self.jb.sync()
+
+
+class TestDatabaseDurability(object):
+
+    def setup(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.path = os.path.join(self.dirpath, 'msyok')
+
+    def teardown(self):
+        if self.jb.is_open():
+            self.jb.close()
+        shutil.rmtree(self.dirpath)
+
+    def test_every_transaction(self):
+        self.jb = api.Database(
+            path=self.path, options=(api.WRITE | api.CREATE),
+            durability=api.DURABILITY_EVERY_TRANSACTION,
+        )
+        assert self.jb._sync_timer is None
+        self.jb.save('msyok', {'name': 'Mosky'})
+
+    def test_interval(self):
+        self.jb = api.Database(
+            path=self.path, options=(api.WRITE | api.CREATE),
+            durability=api.DURABILITY_INTERVAL, sync_interval=0.01,
+        )
+        timer = self.jb._sync_timer
+        assert timer.is_alive()
+        self.jb.save('msyok', {'name': 'Mosky'})
+        self.jb.close()
+        assert self.jb._sync_timer is None
+        assert not timer.is_alive()
+
+    def test_durability_setter_opened(self):
+        self.jb = api.Database(
+            path=self.path, options=(api.WRITE | api.CREATE),
+        )
+        with pytest.raises(api.DatabaseError) as ctx:
+            self.jb.durability = api.DURABILITY_NONE
+        assert str(ctx.value) == (
+            'Could not set durability to an open database.'
+        )
+
+
+class TestDatabaseDump(object):
+
+    def setup(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.jb = api.Database(
+            path=os.path.join(self.dirpath, 'msyok'),
+            options=(api.WRITE | api.CREATE),
+        )
+        self.jb.save('people', {'name': 'Mosky'}, {'name': 'TP'})
+        self.jb.save('things', {'name': 'ejdb'})
+
+    def teardown(self):
+        if self.jb.is_open():
+            self.jb.close()
+        shutil.rmtree(self.dirpath)
+
+    def test_export_import(self):
+        calls = []
+        dump_path = os.path.join(self.dirpath, 'dump')
+        report = self.jb.export(
+            dump_path, progress=lambda *args: calls.append(args),
+        )
+        assert list(report.collections) == ['people', 'things']
+        assert report.seconds >= 0
+        assert calls == [('people', 0, 2), ('things', 1, 2), (None, 2, 2)]
+
+        other = api.Database(
+            path=os.path.join(self.dirpath, 'other'),
+            options=(api.WRITE | api.CREATE),
+        )
+        report = other.import_(dump_path)
+        assert list(report.collections) == ['people', 'things']
+        assert other['people'].count() == 2
+        assert other['things'].find_one()['name'] == 'ejdb'
+
+        self.jb.save('people', {'name': 'Eddie'})
+        other.import_(
+            dump_path, collections=['people'], mode=api.IMPORT_REPLACE,
+        )
+        assert other['people'].count() == 2
+        other.close()
+
+    def test_export_invalid(self):
+        with pytest.raises(ValueError):
+            self.jb.export(self.dirpath, format='xml')
+        with pytest.raises(ValueError):
+            self.jb.import_(self.dirpath, mode='msyok')
+        with pytest.raises(ValueError):
+            self.jb.import_(self.dirpath, mode=None)
+
+    def test_import_json(self):
+        dump_path = os.path.join(self.dirpath, 'dump')
+        self.jb.export(dump_path, format='json')
+        with pytest.raises(ValueError) as ctx:
+            self.jb.import_(dump_path)
+        assert 'JSON' in str(ctx.value)
+        with pytest.raises(ValueError):
+            self.jb.import_(dump_path, collections=['nothing'])
+
 
 class TestCollection(object):
 
@@ -351,6 +469,326 @@ class TestCollectionRetrieval(object):
         assert len(objs) == 1
         assert dict(objs[0]) == self.objs[0]
 
+    def test_insert_many_generated_ids(self):
+        for obj in self.objs:
+            oid = api.bson.ObjectId(obj['_id'])
+            assert self.coll.get(oid) == obj
+        assert len({api.bson.ObjectId(o['_id']).binary[4:9]
+                    for o in self.objs}) == 1
+
+    def test_find_one_cached(self):
+        self.coll.enable_cache()
+        oid = self.objs[0]['_id']
+        assert dict(self.coll.find_one({'_id': oid})) == self.objs[0]
+        assert dict(self.coll.find_one({'_id': oid})) == self.objs[0]
+        info = self.coll.cache_info()
+        assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+        # Writes through another instance invalidate the cache.
+        self.jb['msyok'].save({'_id': oid, 'one': 'uno'})
+        assert self.coll.find_one({'_id': oid})['one'] == 'uno'
+        self.jb['msyok'].remove(oid)
+        assert self.coll.find_one({'_id': oid}) is None
+
+        self.coll.disable_cache()
+        assert self.coll.cache_info() is None
+
+    def test_query_cached(self):
+        self.coll.enable_query_cache()
+        assert self.coll.count({'one': 1}) == 1
+        assert self.coll.find({'one': 1}) == [self.objs[0]]
+        assert self.coll.count({'one': 1}) == 1
+        assert self.coll.find({'one': 1}) == [self.objs[0]]
+        info = self.coll.query_cache_info()
+        assert (info.hits, info.misses, info.currsize) == (2, 2, 2)
+
+        # A write bumps the generation, so results are not served again.
+        self.jb['msyok'].save({'one': 1})
+        assert self.coll.count({'one': 1}) == 2
+        assert self.coll.query_cache_info().hits == 2
+
+        self.coll.disable_query_cache()
+        assert self.coll.query_cache_info() is None
+
+    def test_get(self):
+        obj = self.coll.get(self.objs[1]['_id'])
+        assert dict(obj) == self.objs[1]
+        assert self.coll.get('0123456789abcdef01234567') is None
+        with pytest.raises(ValueError):
+            self.coll.get('msyok')
+
+    def test_get_many(self):
+        missing = '0123456789abcdef01234567'
+        objs = self.coll.get_many([
+            self.objs[3]['_id'], missing, self.objs[0]['_id'],
+        ])
+        assert objs == [self.objs[3], None, self.objs[0]]
+
+    def test_get_cached(self):
+        self.coll.enable_cache()
+        oid = self.objs[2]['_id']
+        assert dict(self.coll.get(oid)) == self.objs[2]
+        assert dict(self.coll.get(oid)) == self.objs[2]
+        assert self.coll.cache_info().hits == 1
+
+    def test_cache_write_race(self):
+        self.coll.enable_cache()
+        oid = self.objs[2]['_id']
+
+        # A write invalidating the document between the lookup and caching
+        # the result, e.g. from another thread.
+        def racing(method):
+            def wrapper(*args, **kwargs):
+                result = method(*args, **kwargs)
+                self.coll._state.invalidate(oid)
+                return result
+            return wrapper
+
+        self.coll._load = racing(self.coll._load)
+        self.coll._execute = racing(self.coll._execute)
+        assert dict(self.coll.get(oid)) == self.objs[2]
+        assert dict(self.coll.find_one({'_id': oid})) == self.objs[2]
+        assert self.coll.cache_info().currsize == 0
+
+    def test_register_schema(self):
+        codec = self.coll.register_schema([('order', int), ('one', int)])
+        assert self.jb['msyok']._state.codec is codec
+        self.coll.save({'order': 6, 'one': 'uno'})   # Falls back.
+        assert self.coll.find_one({'order': 6})['one'] == 'uno'
+        assert self.coll.find({'one': 1}) == [self.objs[0]]
+        assert self.coll.register_schema(None) is None
+
+    def test_document_class(self):
+        assert type(self.coll.find_one({'one': 1})) is not dict
+        assert type(self.coll.find({'one': 1}, document_class=dict)[0]) is dict
+
+        self.jb.document_class = dict
+        assert type(self.coll.get(self.objs[0]['_id'])) is dict
+
+        factory = api.bson.record_factory(['_id', 'order', 'one'])
+        self.jb['msyok'].document_class = factory
+        record = self.coll.find_one({'one': 1})
+        assert isinstance(record, factory.record_class)
+        assert (record.order, record.one) == (4, 1)
+        assert type(self.coll.find_one({'two': 2})) is dict     # Fallback.
+
+    def test_find_binary_view(self):
+        oid = self.coll.insert_one({'blob': b'\x00\x01' * 1024})
+        view = self.coll.find({'_id': oid}, binary_view=True)[0]['blob']
+        assert isinstance(view, memoryview)
+        assert view.tobytes() == b'\x00\x01' * 1024
+        assert isinstance(self.coll.find_one({'_id': oid})['blob'], bytes)
+
+    def test_to_columns(self):
+        columns = self.coll.find().to_columns(['order', 'one'])
+        assert columns['order'].values == [4, 5, 3, 0, -1]
+        assert columns['one'].values == [1, None, None, None, None]
+        assert columns['one'].mask == [False, True, True, True, True]
+
+    def test_to_pandas(self):
+        pytest.importorskip('pandas')
+        df = self.coll.find().to_pandas(['order', 'one'])
+        assert list(df.columns) == ['order', 'one']
+        assert df['order'].tolist() == [4, 5, 3, 0, -1]
+        assert df['one'].isnull().tolist() == [False, True, True, True, True]
+
+    def test_export_parquet(self):
+        pyarrow = pytest.importorskip('pyarrow')
+        parquet = pytest.importorskip('pyarrow.parquet')
+        path = os.path.join(self.dirpath, 'msyok.parquet')
+        count = self.coll.export_parquet(path, fields=['order'], batch_size=2)
+        assert count == len(self.objs)
+        f = parquet.ParquetFile(path)
+        assert f.num_row_groups == 3
+        table = f.read()
+        assert table.column_names == ['order']
+        assert sorted(table.column('order').to_pylist()) == [-1, 0, 3, 4, 5]
+
+        schema = pyarrow.schema([
+            ('order', pyarrow.int32()), ('one', pyarrow.int64()),
+        ])
+        self.coll.export_parquet(path, schema=schema, compression='gzip')
+        table = parquet.read_table(path)
+        assert table.schema == schema
+        assert table.column('one').null_count == 4
+
+        # Fields can be a subset of the schema, in any order.
+        self.coll.export_parquet(path, fields=['one', 'order'], schema=schema)
+        table = parquet.read_table(path)
+        assert table.column_names == ['one', 'order']
+        assert table.schema.field('order').type == pyarrow.int32()
+        assert sorted(table.column('order').to_pylist()) == [-1, 0, 3, 4, 5]
+
+    def test_export_parquet_type_mismatch(self):
+        pytest.importorskip('pyarrow.parquet')
+        path = os.path.join(self.dirpath, 'msyok.parquet')
+        self.coll.save({'order': 'six'})
+        # Some page has a string while the others have integers.
+        with pytest.raises(ValueError):
+            self.coll.export_parquet(path, fields=['order'], batch_size=1)
+        assert not os.path.exists(path)
+        assert not os.path.exists(path + '.tmp')
+
+    def test_save_raw_find_raw(self):
+        oids = self.coll.save_raw(
+            api.bson.encode({'order': 6, 'six': 6}).data,
+            bytearray(api.bson.encode({'order': 7, 'seven': 7}).data),
+        )
+        assert len(oids) == 2
+        assert self.coll.get(oids[0]) == {'_id': oids[0], 'order': 6, 'six': 6}
+
+        datas = list(self.coll.find_raw({'order': {'$gt': 5}}))
+        assert all(isinstance(data, bytes) for data in datas)
+        assert [api.bson.decode_data(data)['order'] for data in datas] == [
+            6, 7,
+        ]
+        views = list(self.coll.find().raw(view=True))
+        assert [v.tobytes() for v in views] == list(self.coll.find().raw())
+
+        with pytest.raises(api.bson.BSONDecodeError):
+            self.coll.save_raw(b'msyok')
+
+    def test_load_dump(self):
+        path = os.path.join(self.dirpath, 'dump.bson')
+        api.bson.write_file(path, self.coll.find_raw())
+        other = self.jb.create_collection('other')
+        assert other.load_dump(path, batch_size=2) == len(self.objs)
+        assert sorted(other.find(), key=lambda o: o['order']) == sorted(
+            self.objs, key=lambda o: o['order'],
+        )
+
+    def test_stats(self):
+        assert self.coll.indexes() == []
+        self.coll.create_number_index('order')
+        self.coll.create_string_index('one')
+        indexes = sorted(self.coll.indexes())
+        assert [(i.path, i.type) for i in indexes] == [
+            ('one', api.STRING), ('order', api.NUMBER),
+        ]
+        assert all(i.size is None or i.size > 0 for i in indexes)
+
+        stats = self.coll.stats()
+        assert stats.name == 'msyok'
+        assert stats.records == len(self.objs)
+        assert stats.size > 0
+        assert 'compressed' in stats.options
+        assert sorted(stats.indexes) == indexes
+
+        db_stats = self.jb.stats()
+        assert list(db_stats.collections) == ['msyok']
+        assert db_stats.collections['msyok'].records == len(self.objs)
+        assert db_stats.size >= stats.size
+
+    def test_bulk_load(self):
+        self.coll.create_number_index('order')
+        self.coll.create_string_index('one')
+        self.coll.create_istring_index('one')
+        specs = sorted(self.coll._get_index_specs())
+
+        with self.coll.bulk_load() as coll:
+            assert coll._get_index_specs() == []
+            assert os.path.exists(coll._index_journal_path)
+            coll.insert_many([{'order': i} for i in range(6, 10)])
+        assert sorted(self.coll._get_index_specs()) == specs
+        assert not os.path.exists(self.coll._index_journal_path)
+        assert self.coll.count({'order': {'$gt': 5}}) == 4
+
+        with pytest.raises(ZeroDivisionError):
+            with self.coll.bulk_load():
+                1 / 0
+        assert sorted(self.coll._get_index_specs()) == specs
+
+        # Simulate a crash inside the block.
+        self.coll.bulk_load().__enter__()
+        assert self.coll._get_index_specs() == []
+        assert sorted(self.coll.restore_indexes()) == specs
+        assert sorted(self.coll._get_index_specs()) == specs
+        assert self.coll.restore_indexes() == []
+
+    def test_maintain_indexes(self):
+        self.coll.create_number_index('order')
+        self.coll.create_string_index('one')
+        self.coll.create_istring_index('one')
+        self.coll.create_array_index('tags')
+        specs = sorted(self.coll._get_index_specs())
+        for path, index_type in specs:
+            self.coll.optimize_index(path, index_type)
+        self.coll.optimize_array_index('tags')
+        assert sorted(self.coll._get_index_specs()) == specs
+
+        assert sorted(self.coll.maintain_indexes()) == specs
+        assert sorted(self.coll.maintain_indexes(api.MAINTENANCE_REBUILD)) == (
+            specs
+        )
+        assert sorted(self.coll._get_index_specs()) == specs
+        with pytest.raises(ValueError):
+            self.coll.maintain_indexes('msyok')
+
+    def test_schedule_maintenance(self):
+        self.coll.create_number_index('order')
+        self.jb.create_collection('other').create_array_index('tags')
+        calls = []
+        maintenance = self.jb.schedule_maintenance(
+            interval=3600, pause=0, progress=lambda *args: calls.append(args),
+        )
+        maintenance.run()
+        assert calls == [('msyok', 0, 2), ('other', 1, 2), (None, 2, 2)]
+        assert maintenance.passes == 1
+
+        # Outside of the window, nothing happens.
+        maintenance.windows = [(time(0), time(0))]
+        maintenance.run()
+        assert maintenance.passes == 1
+
+        self.jb.close()
+        assert self.jb._maintenance is None
+        assert not maintenance._timer.is_alive()
+
+    def test_maintenance_windows(self):
+        windows = [(time(1), time(5)), (time(22), time(0, 30))]
+        for hour, minute, expected in [
+                (0, 0, True), (0, 30, False), (1, 0, True), (4, 59, True),
+                (5, 0, False), (12, 0, False), (22, 0, True), (23, 59, True)]:
+            now = datetime(2016, 7, 20, hour, minute)
+            assert api._in_windows(windows, now) is expected
+        assert api._in_windows(None, datetime.now())
+
+    def test_copy_collection(self):
+        self.coll.create_number_index('order')
+        copied = self.jb.copy_collection(
+            'msyok', 'copied', options={'compressed': True}, batch_size=2,
+        )
+        assert copied.name == 'copied'
+        assert sorted(copied.find(), key=lambda o: o['order']) == sorted(
+            self.objs, key=lambda o: o['order'],
+        )
+        assert copied._get_index_specs() == [('order', api.NUMBER)]
+        assert copied._get_meta()['options']['compressed']
+
+        with pytest.raises(api.DatabaseError):
+            self.jb.copy_collection('msyok', 'copied')
+        with pytest.raises(ValueError):
+            self.jb.copy_collection('msyok', 'msyok')
+
+    def test_jsonl(self):
+        self.coll.insert_one({
+            'order': 6, 'data': b'\x00', 'when': datetime(2016, 7, 20),
+        })
+        fp = six.StringIO()
+        assert self.coll.export_jsonl(fp, batch_size=2) == 6
+        assert len(fp.getvalue().splitlines()) == 6
+
+        other = self.jb.create_collection('other')
+        fp.seek(0)
+        assert other.import_jsonl(fp, batch_size=4) == 6
+        assert sorted(other.find(), key=lambda o: o['order']) == sorted(
+            self.coll.find(), key=lambda o: o['order'],
+        )
+        assert other.find_one({'order': 6})['when'] == datetime(2016, 7, 20)
+
+        with pytest.raises(ValueError):
+            other.import_jsonl(six.StringIO('{}\n\nmsyok\n'))
+
     def test_find_with_hints(self):
         objs = self.coll.find(hints={'$orderby': {'order': 1}})
         assert len(objs) == 5
@@ -398,6 +836,23 @@ class TestCollectionDeletion(object):
         assert result_count == 1
         assert self.coll.find() == self.objs[1:]
 
+    def test_remove(self):
+        self.coll.remove(self.objs[0]['_id'])
+        assert self.coll.find() == self.objs[1:]
+        with pytest.raises(ValueError):
+            self.coll.remove('msyok')
+
+    def test_remove_many(self):
+        oids = [obj['_id'] for obj in self.objs[:3]]
+        oids.append('0123456789abcdef01234567')     # Does not exist.
+        assert self.coll.remove_many(oids, batch_size=2) == 3
+        assert self.coll.find() == self.objs[3:]
+
+    def test_remove_many_invalid(self):
+        with pytest.raises(ValueError):
+            self.coll.remove_many([self.objs[0]['_id'], 'msyok'])
+        assert self.coll.count() == 5
+
     def test_delete_many_empty(self):
         result_count = self.coll.delete_many()
         assert result_count == 5
@@ -2,9 +2,15 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import unicode_literals
+import array
+import binascii
 import collections
+import ctypes
 import datetime
 import hashlib
+import os
+import struct
+import sys
 import uuid
 
 import pytest
@@ -99,6 +105,73 @@ def test_bson_oid():
     assert bs.decode() == {'_id': '0123456789abcdef01234567'}
 
 
+def test_bson_objectid():
+    oid = bson.ObjectId('0123456789abcdef01234567')
+    bs = bson.encode({'ref': oid})
+    assert (
+        bs == b'\x16\x00\x00\x00\x07ref\x00\x01#Eg\x89\xab\xcd\xef\x01#Eg\x00')
+    assert bs.decode() == {'ref': '0123456789abcdef01234567'}
+    assert bs.decode(object_id=True) == {'ref': oid}
+
+
+def test_objectid():
+    oid = bson.ObjectId('0123456789ABCDEF01234567')
+    assert str(oid) == '0123456789abcdef01234567'
+    assert repr(oid) == "ObjectId('0123456789abcdef01234567')"
+    assert oid.binary == b'\x01#Eg\x89\xab\xcd\xef\x01#Eg'
+    assert bson.ObjectId(oid.binary) == oid
+    assert bson.ObjectId(oid) == oid
+    assert bson.ObjectId(oid.to_bsonoid()) == oid
+    assert hash(bson.ObjectId(oid.binary)) == hash(oid)
+    assert oid != '0123456789abcdef01234567'
+    assert oid.generation_time == datetime.datetime(1970, 8, 9, 22, 25, 43)
+
+
+def test_objectid_order():
+    early = bson.ObjectId('0000000fffffffffffffffff')
+    late = bson.ObjectId('00000010000000000000000a')
+    assert early < late
+    assert late >= early
+    assert sorted([late, early]) == [early, late]
+
+
+def test_generate_oid():
+    oids = [bson.generate_oid() for _ in range(1000)]
+    assert len(set(oids)) == 1000
+    counters = [int(binascii.hexlify(oid.binary[9:]), 16) for oid in oids]
+    assert all(
+        (b - a) % 0x1000000 == 1 for a, b in zip(counters, counters[1:])
+    )
+    assert all(oid.binary[4:9] == oids[0].binary[4:9] for oid in oids)
+    now = datetime.datetime.utcnow()
+    delta = now - oids[0].generation_time
+    assert datetime.timedelta(0) <= delta < datetime.timedelta(seconds=5)
+    assert isinstance(bson.ObjectId(), bson.ObjectId)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='Requires os.fork().')
+def test_generate_oid_fork():
+    parent = bson.generate_oid()
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:    # pragma: no cover
+        os.close(r)
+        os.write(w, bson.generate_oid().binary)
+        os._exit(0)
+    os.close(w)
+    child = bson.ObjectId(os.read(r, 12))
+    os.close(r)
+    os.waitpid(pid, 0)
+    assert child.binary[4:9] != parent.binary[4:9]
+
+
+def test_objectid_invalid():
+    with pytest.raises(ValueError):
+        bson.ObjectId('msyok')
+    with pytest.raises(TypeError):
+        bson.ObjectId(42)
+
+
 def test_bson_string():
     bs = bson.encode({'answer': '42'})
     assert bs == b'\x14\x00\x00\x00\x02answer\x00\x03\x00\x00\x0042\x00\x00'
@@ -114,6 +187,80 @@ def test_bson_binary():
     assert bs.decode() == {'<3': b'\xe2\x99\xa5'}
 
 
+def test_bson_binary_buffer():
+    expected = bson.encode({'<3': b'\xe2\x99\xa5'})
+    assert bson.encode({'<3': bytearray(b'\xe2\x99\xa5')}) == expected
+    assert bson.encode({'<3': memoryview(b'\xe2\x99\xa5')}) == expected
+    assert bson.encode({'<3': memoryview(b'\x00\xe2\x99\xa5')[1:]}) == (
+        expected
+    )
+
+
+def test_bson_binary_buffer_strided():
+    expected = bson.encode({'<3': b'\xe2\x99\xa5'})
+    assert bson.encode({'<3': memoryview(b'\xa5\x99\xe2')[::-1]}) == expected
+    strided = memoryview(bytearray(b'\xe2\x00\x99\x00\xa5\x00'))[::2]
+    assert bson.encode({'<3': strided}) == expected
+
+    view = expected.decode(binary_view=True)['<3']
+    reversed_view = bson.encode({'<3': view[::-1]}).decode()
+    assert reversed_view == {'<3': b'\xa5\x99\xe2'}
+
+
+def test_bson_binary_view():
+    bs = bson.encode({'<3': b'\xe2\x99\xa5', 'md5': bson.MD5(b'\x00' * 16)})
+    obj = bs.decode(binary_view=True)
+    view = obj['<3']
+    assert isinstance(view, memoryview)
+    assert view.tobytes() == b'\xe2\x99\xa5'
+    assert isinstance(obj['md5'], bson.MD5)     # Other subtypes are copied.
+
+    # The view keeps the data alive, and can be encoded again.
+    del bs, obj
+    assert bson.encode({'<3': view}).decode() == {'<3': b'\xe2\x99\xa5'}
+
+
+def test_bson_numeric_array():
+    doubles = [i / 4.0 for i in range(-60, 60)]
+    ints = list(range(-60, 60))
+    longs = [i * 2 ** 40 for i in range(-60, 60)]
+    bs = bson.encode({
+        'doubles': array.array('d', doubles),
+        'ints': array.array('i', ints),
+        'longs': array.array('q' if six.PY3 else 'l', longs),
+    })
+    expected = {'doubles': doubles, 'ints': ints, 'longs': longs}
+    assert bs == bson.encode(expected)
+    assert bs.decode() == expected
+
+    obj = bs.decode(numeric_arrays='array')
+    assert obj['doubles'] == array.array('d', doubles)
+    assert obj['ints'] == array.array('i', ints)
+    assert obj['longs'].tolist() == longs
+
+    # Arrays with mixed or non-numeric items are decoded as lists.
+    bs = bson.encode({'a': [1, 2 ** 40], 'b': [1.0, 'x'], 'c': []})
+    obj = bs.decode(numeric_arrays='array')
+    assert obj == {'a': [1, 2 ** 40], 'b': [1.0, 'x'], 'c': []}
+
+    # So are arrays of documents and strings, and empty arrays.
+    bs = bson.encode({'d': [{'x': 1}], 's': ['x', 'y'], 'e': []})
+    assert bs.decode(numeric_arrays='array') == bs.decode()
+
+
+def test_bson_numeric_array_numpy():
+    numpy = pytest.importorskip('numpy')
+    values = numpy.arange(1000, dtype='float64') / 3
+    bs = bson.encode({'values': values})
+    assert bs == bson.encode({'values': values.tolist()})
+    decoded = bs.decode(numeric_arrays='numpy')['values']
+    assert isinstance(decoded, numpy.ndarray)
+    assert (decoded == values).all()
+
+    bs = bson.encode({'values': numpy.arange(10, dtype='int16')})
+    assert bs.decode() == {'values': list(range(10))}
+
+
 def test_bson_uuid():
     bs = bson.encode({'uuid': uuid.UUID('12345678123456781234567812345678')})
     assert (
@@ -181,6 +328,203 @@ def test_bson_array_object():
     }
 
 
+def test_bson_deeply_nested():
+    depth = sys.getrecursionlimit() * 2
+    obj = leaf = {}
+    for _ in range(depth):
+        leaf['a'] = [{}]
+        leaf = leaf['a'][0]
+    leaf['answer'] = 42
+
+    decoded = bson.encode(obj).decode(document_class=dict)
+    for _ in range(depth):
+        decoded = decoded['a'][0]
+    assert decoded == {'answer': 42}
+
+
+def test_bson_from_buffer():
+    data = bson.encode({'a': 1}).data
+    assert bson.BSON.from_buffer(data).decode() == {'a': 1}
+    assert bson.BSON.from_buffer(bytearray(data)) == data
+    for invalid in [b'', data[:-1], data[:-1] + b'\x01', b'\x05\x00']:
+        with pytest.raises(bson.BSONDecodeError):
+            bson.BSON.from_buffer(invalid)
+
+
+def test_bson_from_buffer_no_copy(monkeypatch):
+    buf = bytearray(bson.encode({'a': 1}).data)
+    # Neither validation nor wrapping reads the data out of the buffer.
+    monkeypatch.setattr(ctypes, 'string_at', None)
+    bs = bson.BSON.from_buffer(buf)
+    monkeypatch.undo()
+    assert ctypes.addressof(bs._owner) == ctypes.addressof(
+        (ctypes.c_char * len(buf)).from_buffer(buf),
+    )
+    # The wrapped data is the buffer itself, so changes are visible.
+    buf[buf.index(b'a\x00') + 2] = 2
+    assert bs.decode() == {'a': 2}
+
+
+def test_bson_from_buffer_corrupt_element():
+    data = bson.encode({'a': 'msyok', 'b': {'c': 'msyok'}}).data
+    # Length of string "a" pointing past the end of the document.
+    offset = data.index(b'a\x00') + 2
+    corrupt = data[:offset] + struct.pack('<i', 1000) + data[offset + 4:]
+    with pytest.raises(bson.BSONDecodeError):
+        bson.BSON.from_buffer(corrupt)
+    # Length of sub-document "b" pointing past the end of the document.
+    offset = data.index(b'b\x00') + 2
+    corrupt = data[:offset] + struct.pack('<i', 1000) + data[offset + 4:]
+    with pytest.raises(bson.BSONDecodeError):
+        bson.BSON.from_buffer(corrupt)
+    # Length of string "c" pointing past the end of the sub-document.
+    offset = data.index(b'c\x00') + 2
+    corrupt = data[:offset] + struct.pack('<i', 20) + data[offset + 4:]
+    with pytest.raises(bson.BSONDecodeError):
+        bson.BSON.from_buffer(corrupt)
+
+
+def test_bson_file(tmpdir):
+    path = str(tmpdir.join('dump.bson'))
+    docs = [{'a': 1}, {'b': [1, 2]}, {'c': {'d': 'msyok'}}]
+    count = bson.write_file(path, [
+        docs[0], bson.encode(docs[1]), bson.encode(docs[2]).data,
+    ])
+    assert count == 3
+    datas = list(bson.iter_file(path))
+    assert [bson.decode_data(bytes(data)) for data in datas] == docs
+    assert bson.BSON.from_buffer(datas[1]).decode() == docs[1]
+
+    with open(path, 'ab') as f:
+        f.write(b'\x10\x00\x00\x00')
+    it = bson.iter_file(path)
+    assert len([next(it) for _ in docs]) == 3
+    with pytest.raises(bson.BSONDecodeError):
+        next(it)
+
+    open(path, 'wb').close()
+    assert list(bson.iter_file(path)) == []
+
+
+def test_decode_key_shared():
+    key = ''.join(['shared', 'key'])    # Not a compile-time constant.
+    a = bson.encode({key: 1}).decode()
+    b = bson.encode({key: [{key: 2}]}).decode()
+    keys = [next(iter(a)), next(iter(b)), next(iter(b[key][0]))]
+    assert all(k is keys[0] for k in keys)
+
+
+def test_document_class():
+    bs = bson.encode({'a': 1, 'b': {'c': [{'d': None}]}})
+    obj = bs.decode(document_class=dict)
+    assert obj == {'a': 1, 'b': {'c': [{'d': None}]}}
+    assert type(obj) is dict
+    assert type(obj['b']['c'][0]) is dict
+
+    obj = bs.decode(document_class=collections.OrderedDict)
+    assert type(obj['b']) is collections.OrderedDict
+    assert list(obj) == ['a', 'b']
+
+
+def test_record_factory():
+    factory = bson.record_factory(['a', 'b'], name='Thing')
+    obj = bson.encode({'a': 1, 'b': {'a': 2, 'b': 3}}).decode(
+        document_class=factory,
+    )
+    assert type(obj).__name__ == 'Thing'
+    assert obj.a == 1
+    assert obj.b == factory.record_class(2, 3)
+    assert obj['b']._asdict() == {'a': 2, 'b': 3}
+    assert repr(obj.b) == 'Thing(a=2, b=3)'
+    assert not hasattr(obj, '__dict__')
+
+    # Documents of another layout fall back to dict.
+    obj = bson.encode({'a': 1, 'c': {}}).decode(document_class=factory)
+    assert obj == {'a': 1, 'c': {}}
+
+    with pytest.raises(ValueError):
+        bson.record_factory(['a', 'a'])
+
+
+def test_decode_columns():
+    datas = [
+        bson.encode({'a': 1, 'b': 'x', 'c': {'d': [1]}}).data,
+        bson.encode({'b': None, 'a': 2}).data,
+        bson.encode({'c': True}).data,
+    ]
+    columns = bson.decode_columns(datas, ['a', 'c'])
+    assert list(columns) == ['a', 'c']
+    assert columns['a'] == bson.Column([1, 2, None], [False, False, True])
+    assert columns['c'].values == [{'d': [1]}, None, True]
+    assert columns['c'].mask == [False, True, False]
+
+
+def test_column_to_numpy():
+    numpy = pytest.importorskip('numpy')
+    values, mask = bson.column_to_numpy(
+        bson.Column([1, None, 3], [False, True, False]),
+    )
+    assert values.dtype == numpy.int64
+    assert values.tolist() == [1, 0, 3]
+    assert mask.tolist() == [False, True, False]
+
+    values, _ = bson.column_to_numpy(bson.Column([1, 2.5], [False, False]))
+    assert values.dtype == numpy.float64
+    values, _ = bson.column_to_numpy(bson.Column([1, 'x'], [False, False]))
+    assert values.dtype == object
+
+
+def test_codec():
+    codec = bson.compile_codec([
+        ('name', six.text_type),
+        ('age', int),
+        ('score', float),
+        ('male', bool),
+        ('born', datetime.datetime),
+        ('likes', list),
+    ])
+    obj = collections.OrderedDict([
+        ('name', 'Grenny'),
+        ('age', 1),
+        ('score', 9.5),
+        ('male', True),
+        ('born', datetime.datetime(2015, 8, 19)),
+        ('likes', ['green color', 'night']),
+    ])
+    bs = bson.encode(obj, codec=codec)
+    assert bs == bson.encode(obj)
+    assert bs.decode(codec=codec) == obj
+    assert codec.decode_data(bs.data) == obj
+
+
+def test_codec_id():
+    codec = bson.compile_codec([('name', six.text_type)])
+    obj = {'_id': '0123456789abcdef01234567', 'name': 'Mosky'}
+    bs = codec.encode(obj)
+    assert bs == bson.encode(collections.OrderedDict([
+        ('_id', '0123456789abcdef01234567'), ('name', 'Mosky'),
+    ]))
+    assert codec.decode(bs) == obj
+
+
+def test_codec_mismatch():
+    codec = bson.compile_codec([('name', six.text_type), ('age', int)])
+    for obj in [
+            {'name': 'Mosky', 'age': '42'},     # Wrong type.
+            {'name': 'Mosky'},                  # Missing field.
+            {'_id': '0123456789abcdef01234567'},    # Projected to `_id`.
+            {},
+            {'name': 'Mosky', 'age': 42, 'extra': None}]:
+        bs = codec.encode(obj)
+        assert bs == bson.encode(obj)
+        assert codec.decode(bs) == obj
+
+
+def test_codec_duplicate_field():
+    with pytest.raises(ValueError):
+        bson.compile_codec([('name', six.text_type), ('name', int)])
+
+
 def test_bson_unrecognized():
 
     class Thing(object):
@@ -192,6 +536,45 @@ def test_bson_unrecognized():
     assert str(ctx.value) == 'Could not encode object Thing.'
 
 
+def test_register_type():
+
+    class Money(object):
+        def __init__(self, cents):
+            self.cents = cents
+
+    class Yen(Money):
+        pass
+
+    bson.register_type(Money, lambda value: value.cents)
+    bs = bson.encode({'price': Money(1200), 'cheap': Yen(100)})
+    assert bs.decode() == {'price': 1200, 'cheap': 100}
+
+
+def test_register_binary_type():
+
+    class Point(object):
+        def __init__(self, x, y):
+            self.x = x
+            self.y = y
+
+    subtype = bson.c.BSON_BIN_USER + 1
+    bson.register_binary_type(
+        Point, subtype,
+        encode=lambda p: '{0},{1}'.format(p.x, p.y).encode('ascii'),
+        decode=lambda data: Point(*(int(v) for v in data.split(b','))),
+    )
+    point = bson.encode({'point': Point(3, 4)}).decode()['point']
+    assert isinstance(point, Point)
+    assert (point.x, point.y) == (3, 4)
+
+
+def test_register_binary_type_builtin():
+    with pytest.raises(ValueError):
+        bson.register_binary_type(
+            object, bson.c.BSON_BIN_UUID, encode=bytes, decode=bytes,
+        )
+
+
 def test_bson_decode_error_message():
     with pytest.raises(bson.BSONDecodeError) as ctx:
         raise bson.BSONDecodeError()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from ejdb import cache
+
+
+class TestLRUCache(object):
+
+    def test_get_put(self):
+        c = cache.LRUCache()
+        assert c.get('a') is None
+        c.put('a', b'msyok', 5)
+        assert c.get('a') == b'msyok'
+        info = c.info()
+        assert info.hits == 1
+        assert info.misses == 1
+        assert info.currsize == 1
+        assert info.currbytes == 5
+
+    def test_maxsize(self):
+        c = cache.LRUCache(maxsize=2)
+        c.put('a', 1)
+        c.put('b', 2)
+        c.get('a')      # Make 'b' the least recently used.
+        c.put('c', 3)
+        assert 'a' in c
+        assert 'b' not in c
+        assert 'c' in c
+
+    def test_maxbytes(self):
+        c = cache.LRUCache(maxsize=None, maxbytes=10)
+        c.put('a', b'', 6)
+        c.put('b', b'', 6)
+        assert 'a' not in c
+        assert c.info().currbytes == 6
+
+        c.put('c', b'', 11)     # Too large to be cached at all.
+        assert 'c' not in c
+        assert 'b' in c
+
+    def test_ttl(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(cache, '_clock', lambda: now[0])
+        c = cache.LRUCache(ttl=10)
+        c.put('a', 1)
+        now[0] += 5
+        assert c.get('a') == 1
+        now[0] += 5
+        assert c.get('a') is None
+        assert 'a' not in c
+
+    def test_discard_clear(self):
+        c = cache.LRUCache()
+        c.put('a', 1, 1)
+        c.put('b', 2, 1)
+        c.discard('a')
+        c.discard('nope')
+        assert len(c) == 1
+        c.clear()
+        assert len(c) == 0
+        assert c.info().currbytes == 0
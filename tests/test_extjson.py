@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import datetime
+import uuid
+
+import pytest
+
+from ejdb import bson, extjson
+
+
+def test_round_trip():
+    doc = {
+        '_id': bson.ObjectId('0123456789abcdef01234567'),
+        'date': datetime.datetime(2016, 7, 20, 12, 34, 56, 789000),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'data': b'\x00\xff',
+        'md5': bson.MD5(b'\x01' * 16),
+        'items': [1, 2.5, None, 'msyok'],
+    }
+    s = extjson.dumps(doc)
+    assert '{"$oid":"0123456789abcdef01234567"}' in s
+    assert '{"$date":1469018096789}' in s
+    assert '{"$uuid":"12345678-1234-5678-1234-567812345678"}' in s
+    assert '{"$binary":{"base64":"AP8=","subType":"00"}}' in s
+    loaded = extjson.loads(s)
+    assert loaded == doc
+    assert isinstance(loaded['md5'], bson.MD5)
+
+
+def test_loads_variants():
+    doc = extjson.loads(
+        '{"a": {"$date": {"$numberLong": "1000"}},'
+        ' "b": {"$date": "2016-07-20T12:34:56.789Z"},'
+        ' "c": {"$binary": "AAE=", "$type": "00"},'
+        ' "d": {"$binary": {"base64": "EjRWeBI0VngSNFZ4EjRWeA==",'
+        ' "subType": "04"}},'
+        ' "e": {"$numberLong": "42"}}'
+    )
+    assert doc == {
+        'a': datetime.datetime(1970, 1, 1, 0, 0, 1),
+        'b': datetime.datetime(2016, 7, 20, 12, 34, 56, 789000),
+        'c': b'\x00\x01',
+        'd': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'e': 42,
+    }
+
+
+def test_invalid():
+    with pytest.raises(TypeError):
+        extjson.dumps({'a': object()})
+    with pytest.raises(ValueError):
+        extjson.loads('{"a": {"$binary": {"base64": "AA=="}}}')
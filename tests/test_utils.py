@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import threading
+
 from ejdb import utils
 
 from .utils import skipifpypy
@@ -36,3 +38,20 @@ class TestCObjectWrapper(object):
         assert finalizer._ran is False
         inner()
         assert finalizer._ran is True
+
+
+class TestPeriodicTimer(object):
+
+    def test_stop(self):
+        called = threading.Event()
+        timer = utils.PeriodicTimer(0.01, called.set)
+        timer.start()
+        assert called.wait(1)
+        timer.stop()
+        assert not timer.is_alive()
+
+    def test_function_returns_false(self):
+        timer = utils.PeriodicTimer(0.01, lambda: False)
+        timer.start()
+        timer.join(1)
+        assert not timer.is_alive()